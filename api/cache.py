@@ -0,0 +1,98 @@
+import os
+import time
+from collections import OrderedDict
+
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "1024"))
+# upper bound on staleness if a writer ever forgets to bump the generation
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "300"))
+# how often the generation counter is re-read from Mongo
+API_CACHE_GENERATION_POLL = float(os.getenv("API_CACHE_GENERATION_POLL", "5"))
+
+# must match crawler.storage.GENERATION_KEY (not imported: that module connects on import)
+GENERATION_KEY = "data_generation"
+
+
+def cache_key(endpoint, **params):
+    """Hashable key for a response; parameter order and unset params do not matter."""
+    items = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, (list, set, dict)):
+            value = tuple(sorted(value))
+        items.append((name, value))
+    return endpoint, tuple(items)
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of endpoint results with a TTL.
+
+    Every entry belongs to a data generation, a counter in `crawler_state`
+    that the crawler bumps after each write cycle. The counter is polled at
+    most every `poll_interval` seconds and the whole cache is dropped when it
+    moves, so hits cost a dict lookup and no Mongo round trip.
+    """
+
+    def __init__(self, max_entries=API_CACHE_MAX_ENTRIES, ttl=API_CACHE_TTL,
+                 poll_interval=API_CACHE_GENERATION_POLL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self.reset()
+
+    def reset(self):
+        self._entries = OrderedDict()
+        self.generation = None
+        self._checked_at = None
+
+    async def sync_generation(self, db):
+        """Re-read the generation counter if the last read is older than the poll interval."""
+        now = self._clock()
+        if self._checked_at is not None and now - self._checked_at < self.poll_interval:
+            return self.generation
+        # claim the poll first so concurrent requests do not all hit Mongo
+        self._checked_at = now
+        doc = await db.crawler_state.find_one({"key": GENERATION_KEY}, {"value": 1})
+        generation = doc["value"] if doc else 0
+        if generation != self.generation:
+            self._entries.clear()
+            self.generation = generation
+        return generation
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, generation=None):
+        """
+        Store `value`. Pass the generation `lookup` returned: if the counter
+        moved while the value was being built, it may predate the bump and is dropped.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def lookup(self, db, key):
+        """(current generation, cached value for `key` or None)."""
+        generation = await self.sync_generation(db)
+        if self.max_entries <= 0:
+            return generation, None
+        return generation, self.get(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
@@ -1,6 +1,35 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 import os
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = MongoClient(MONGO_URI)
-db = client["books_crawler"]
+MONGO_DB = os.getenv("MONGO_DB", "books_crawler")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+client = None
+db = None
+
+
+async def connect():
+    """Open the async Mongo client; called from the app's lifespan on startup."""
+    global client, db
+    client = AsyncMongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+    )
+    db = client[MONGO_DB]
+
+
+async def close():
+    global client, db
+    if client is not None:
+        await client.close()
+    client, db = None, None
+
+
+def get_db():
+    """FastAPI dependency returning the async database handle."""
+    if db is None:
+        raise RuntimeError("Mongo client is not connected; is the app lifespan running?")
+    return db
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+
+# documents pulled from Mongo per cursor batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# bytes buffered before a chunk is handed to the client
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # ObjectId and anything else BSON hands back
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value, default=_json_default, separators=(",", ":"))
+    return "" if value is None else value
+
+
+async def ndjson_chunks(docs, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """One JSON object per line, batched into chunks of roughly `chunk_bytes`."""
+    buf = []
+    size = 0
+    async for doc in docs:
+        line = json.dumps(doc, default=_json_default, ensure_ascii=False, separators=(",", ":")) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+async def csv_chunks(docs, columns, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """CSV with a header row of `columns`; nested values (meta) are JSON-encoded."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    async for doc in docs:
+        writer.writerow([_csv_value(doc.get(col)) for col in columns])
+        if out.tell() >= chunk_bytes:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks, level=6):
+    """Compress a byte stream on the fly as a single gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
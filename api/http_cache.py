@@ -0,0 +1,39 @@
+import hashlib
+import os
+from fastapi import Request, Response
+
+# responses are per API key, so shared caches stay out unless an operator opts in
+API_CACHE_CONTROL = os.getenv("API_CACHE_CONTROL", "private, max-age=0, must-revalidate")
+
+
+def make_etag(*parts):
+    """Strong ETag over the parts that determine a representation."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def cache_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": API_CACHE_CONTROL, "Vary": "X-API-Key"}
+
+
+def conditional(request: Request, response: Response, etag: str):
+    """
+    Attach validators to `response`; return a 304 to send instead when the
+    client already holds this representation, else None.
+    """
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -4,12 +4,16 @@ from fastapi_limiter.depends import RateLimiter
 import redis.asyncio as redis
 from contextlib import asynccontextmanager
 
-from api.routers import books, changes
+from api import deps
+from api.routers import books, changes, stats
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup logic ---
+    # Open the async Mongo connection pool shared by all requests
+    await deps.connect()
+
     # Initialize Redis client for rate limiting
     redis_client = await redis.from_url("redis://localhost", encoding="utf8", decode_responses=True)
     await FastAPILimiter.init(redis_client)
@@ -19,6 +23,7 @@ async def lifespan(app: FastAPI):
     # --- Shutdown logic ---
     await redis_client.close()
     await FastAPILimiter.close()
+    await deps.close()
 
 
 app = FastAPI(
@@ -30,6 +35,7 @@ app = FastAPI(
         * Filter books by category, price, and rating
         * View individual book details
         * Track and view recent changes detected by the crawler
+        * Catalogue statistics by category, rating and price
 
         🔒 All endpoints require an `X-API-Key` header.
         """,
@@ -57,3 +63,8 @@ app.include_router(
     changes.router,
     dependencies=[Depends(RateLimiter(times=100, seconds=3600))]
 )
+
+app.include_router(
+    stats.router,
+    dependencies=[Depends(RateLimiter(times=100, seconds=3600))]
+)
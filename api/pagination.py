@@ -0,0 +1,44 @@
+import base64
+import json
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+def encode_cursor(doc, sort_by=None):
+    """Opaque token for the position just after `doc` in (sort_by, _id) order."""
+    payload = {"id": str(doc["_id"])}
+    if sort_by:
+        payload["s"] = sort_by
+        payload["k"] = doc.get(sort_by)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort_by=None):
+    """Return (sort_value, ObjectId); raises a 400 for tokens we did not issue."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        oid = ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # a position in one order means nothing in another
+    if payload.get("s") != sort_by or (sort_by and "k" not in payload):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by")
+    return payload.get("k"), oid
+
+
+def after_cursor(sort_by, value, oid):
+    """Keyset filter selecting documents strictly after (value, oid) in ascending order."""
+    if not sort_by:
+        return {"_id": {"$gt": oid}}
+    if value is None:
+        # nulls sort first, so everything non-null comes after them
+        return {"$or": [
+            {sort_by: None, "_id": {"$gt": oid}},
+            {sort_by: {"$ne": None}},
+        ]}
+    return {"$or": [
+        {sort_by: {"$gt": value}},
+        {sort_by: value, "_id": {"$gt": oid}},
+    ]}
@@ -1,12 +1,49 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
 from typing import Optional
 from pymongo import ASCENDING
 from api.security.auth import get_api_key
-from api.deps import db
+from api.cache import cache_key, response_cache
+from api.deps import get_db
+from api.export import EXPORT_BATCH_SIZE, FORMATS, csv_chunks, gzip_chunks, ndjson_chunks
+from api.http_cache import conditional, make_etag
+from api.pagination import after_cursor, decode_cursor, encode_cursor
+from api.schemas import BOOK_FIELDS, LIST_FIELDS, BookList, BookOut, BookSearchList
+from utils.fingerprint import FINGERPRINT_FIELDS
 
 router = APIRouter(prefix="/books", tags=["Books"])
 
+FIELDS_DESCRIPTION = f"Comma-separated fields to return (`_id` is always included). Available: {', '.join(BOOK_FIELDS)}"
+
+def parse_fields(fields: Optional[str], default):
+    """Turn the `fields` query parameter into a Mongo inclusion projection."""
+    if not fields:
+        names = default
+    else:
+        names = [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "_id"]
+        unknown = sorted(set(names) - set(BOOK_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # an empty inclusion projection would return the whole document
+    return {name: 1 for name in names} or {"_id": 1}
+
+def book_filter(category=None, min_price=None, max_price=None, rating=None):
+    """Mongo filter for the catalogue query parameters shared by list, search and export."""
+    # books the crawler marked removed stay readable by id but leave the catalogue
+    query = {"meta.removed_at": None}
+    if category:
+        query["category"] = category
+    if rating:
+        query["rating"] = rating
+    if min_price is not None or max_price is not None:
+        query["price_including_tax"] = {}
+        if min_price is not None:
+            query["price_including_tax"]["$gte"] = min_price
+        if max_price is not None:
+            query["price_including_tax"]["$lte"] = max_price
+    return query
+
 @router.get(
     "/",
     summary="List books",
@@ -17,66 +54,213 @@ router = APIRouter(prefix="/books", tags=["Books"])
     Use `sort_by` to order results by rating, price, or number of reviews.
     """,
         dependencies=[Depends(get_api_key)],
-        response_description="A paginated list of book objects."
+        response_description="A paginated list of book objects.",
+        response_model=BookList,
+        response_model_exclude_unset=True,
     )
-def list_books(
+async def list_books(
+    request: Request,
+    response: Response,
     category: Optional[str] = Query(None, description="Filter by book category"),
     min_price: Optional[float] = Query(None, description="Minimum book price"),
     max_price: Optional[float] = Query(None, description="Maximum book price"),
     rating: Optional[int] = Query(None, ge=1, le=5, description="Book rating (1–5)"),
     sort_by: Optional[str] = Query(None, enum=["rating", "price_including_tax", "num_reviews"]),
-    page: int = Query(1, ge=1, description="Page number for pagination"),
-    page_size: int = Query(10, le=100, description="Number of books per page"),
+    page: int = Query(1, ge=1, description="Page number for pagination (ignored when `cursor` is set)"),
+    page_size: int = Query(10, ge=1, le=100, description="Number of books per page"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous response; constant time at any depth"),
+    include_total: bool = Query(True, description="Count all matching books (an extra query per request)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db=Depends(get_db),
 ):
     """List books with filters, sorting, and pagination."""
-    query = {}
-    if category:
-        query["category"] = category
-    if rating:
-        query["rating"] = rating
-    if min_price is not None or max_price is not None:
-        query["price_including_tax"] = {}
-        if min_price is not None:
-            query["price_including_tax"]["$gte"] = min_price
-        if max_price is not None:
-            query["price_including_tax"]["$lte"] = max_price
-    # MongoDB query
-    cursor = db.books.find(query)
+    projection = parse_fields(fields, LIST_FIELDS)
+    key = cache_key(
+        "books.list", category=category, min_price=min_price, max_price=max_price,
+        rating=rating, sort_by=sort_by, page=None if cursor else page, page_size=page_size,
+        cursor=cursor, include_total=include_total, fields=list(projection),
+    )
+    generation, cached = await response_cache.lookup(db, key)
+    # a listing only changes when the crawler moves the data generation
+    not_modified = conditional(request, response, make_etag(generation, key))
+    if not_modified:
+        return not_modified
+    if cached is not None:
+        return cached
 
-    # Sorting (default ascending)
-    if sort_by:
-        cursor = cursor.sort(sort_by, ASCENDING)
+    query = book_filter(category, min_price, max_price, rating)
 
-    # Get total count (PyMongo 4+ compatible)
-    total = db.books.count_documents(query)
+    # Keyset pagination: resume strictly after the (sort key, _id) in the cursor
+    page_query = query
+    if cursor:
+        value, oid = decode_cursor(cursor, sort_by)
+        page_query = {"$and": [query, after_cursor(sort_by, value, oid)]}
 
-    # Pagination
-    cursor = cursor.skip((page - 1) * page_size).limit(page_size)
-    results = list(cursor)
+    strip_sort_key = bool(sort_by) and sort_by not in projection
+    if strip_sort_key:
+        # the cursor needs the sort key even when the client did not ask for it
+        projection[sort_by] = 1
 
-    # Convert ObjectId -> str
-    for book in results:
-        book["_id"] = str(book["_id"])
+    # MongoDB query; _id breaks ties so the order is total
+    sort = [(sort_by, ASCENDING), ("_id", ASCENDING)] if sort_by else [("_id", ASCENDING)]
+    db_cursor = db.books.find(page_query, projection).sort(sort)
+    if not cursor:
+        db_cursor = db_cursor.skip((page - 1) * page_size)
+    # one extra row tells us whether there is a next page
+    results = await db_cursor.limit(page_size + 1).to_list(None)
+    has_more = len(results) > page_size
+    results = results[:page_size]
 
-    return {
-        "total": total,
+    next_cursor = encode_cursor(results[-1], sort_by) if has_more else None
+    if strip_sort_key:
+        for book in results:
+            book.pop(sort_by, None)
+
+    body = {
+        "total": await db.books.count_documents(query) if include_total else None,
+        "page": None if cursor else page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+        "books": results,
+    }
+    response_cache.set(key, body, generation)
+    return body
+
+
+@router.get(
+    "/search",
+    summary="Search books",
+    description="""
+    Full-text search over book titles and descriptions.
+
+    Matches are stemmed English words; quote a phrase (`"the secret garden"`) to
+    require it and prefix a word with `-` to exclude it. Results are ranked by
+    relevance (`score`), with title matches weighted above description matches.
+    """,
+    dependencies=[Depends(get_api_key)],
+    response_model=BookSearchList,
+    response_model_exclude_unset=True,
+)
+async def search_books(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    category: Optional[str] = Query(None, description="Filter by book category"),
+    page: int = Query(1, ge=1, description="Page number for pagination"),
+    page_size: int = Query(10, ge=1, le=100, description="Number of books per page"),
+    include_total: bool = Query(True, description="Count all matching books (an extra query per request)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db=Depends(get_db),
+):
+    """Rank books matching `q` using the text index on name and description."""
+    projection = parse_fields(fields, LIST_FIELDS)
+    key = cache_key(
+        "books.search", q=q.strip(), category=category, page=page, page_size=page_size,
+        include_total=include_total, fields=list(projection),
+    )
+    generation, cached = await response_cache.lookup(db, key)
+    not_modified = conditional(request, response, make_etag(generation, key))
+    if not_modified:
+        return not_modified
+    if cached is not None:
+        return cached
+
+    query = {"$text": {"$search": q}, **book_filter(category)}
+    score = {"$meta": "textScore"}
+    results = await (
+        db.books.find(query, {**projection, "score": score})
+        .sort([("score", score), ("_id", ASCENDING)])
+        .skip((page - 1) * page_size)
+        .limit(page_size)
+        .to_list(None)
+    )
+    body = {
+        "total": await db.books.count_documents(query) if include_total else None,
         "page": page,
         "page_size": page_size,
         "books": results,
     }
+    response_cache.set(key, body, generation)
+    return body
 
 
-@router.get("/{book_id}", dependencies=[Depends(get_api_key)])
-def get_book(book_id: str):
-    """Return full details about a specific book."""
+# declared before /{book_id} so "export" is not taken for a book id
+@router.get(
+    "/export",
+    summary="Export books",
+    description="""
+    Stream every book matching the filters as NDJSON or CSV in one response.
+
+    Documents are read from a server-side cursor in `_id` order and written out
+    as the client consumes them, so memory stays flat however large the export.
+    """,
+    dependencies=[Depends(get_api_key)],
+    response_class=StreamingResponse,
+    response_description="NDJSON (one book per line) or CSV with a header row.",
+)
+async def export_books(
+    category: Optional[str] = Query(None, description="Filter by book category"),
+    min_price: Optional[float] = Query(None, description="Minimum book price"),
+    max_price: Optional[float] = Query(None, description="Maximum book price"),
+    rating: Optional[int] = Query(None, ge=1, le=5, description="Book rating (1–5)"),
+    format: str = Query("ndjson", enum=list(FORMATS), description="Output format"),
+    gzip: bool = Query(False, description="gzip the stream (sent with `Content-Encoding: gzip`)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db=Depends(get_db),
+):
+    """Stream the filtered catalogue without pagination."""
+    projection = parse_fields(fields, BOOK_FIELDS)
+    docs = db.books.find(book_filter(category, min_price, max_price, rating), projection)
+    docs = docs.sort("_id", ASCENDING).batch_size(EXPORT_BATCH_SIZE)
+
+    if format == "csv":
+        body = csv_chunks(docs, ["_id", *(f for f in projection if f != "_id")])
+    else:
+        body = ndjson_chunks(docs)
+    headers = {"Content-Disposition": f'attachment; filename="books.{format}"'}
+    if gzip:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=FORMATS[format], headers=headers)
+
+
+@router.get(
+    "/{book_id}",
+    dependencies=[Depends(get_api_key)],
+    response_model=BookOut,
+    response_model_exclude_unset=True,
+)
+async def get_book(
+    request: Request,
+    response: Response,
+    book_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db=Depends(get_db),
+):
+    """Return full details about a specific book (raw HTML is kept out of the response)."""
     try:
         oid = ObjectId(book_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid book ID format")
 
-    book = db.books.find_one({"_id": oid})
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
+    projection = parse_fields(fields, BOOK_FIELDS)
+    key = cache_key("books.get", book_id=str(oid), fields=list(projection))
+    generation, entry = await response_cache.lookup(db, key)
+    if entry is None:
+        # content_hash versions the book, so it is always read for the ETag
+        book = await db.books.find_one({"_id": oid}, {**projection, "content_hash": 1})
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        version = book.get("content_hash") if "content_hash" in projection else book.pop("content_hash", None)
+        # content_hash only covers the tracked fields; meta and crawl_timestamp change on their own
+        untracked = {k: v for k, v in book.items() if k not in FINGERPRINT_FIELDS}
+        # legacy documents without a hash fall back to the data generation
+        etag = make_etag(version or generation, untracked, key)
+        entry = (etag, book)
+        response_cache.set(key, entry, generation)
 
-    book["_id"] = str(book["_id"])
+    etag, book = entry
+    not_modified = conditional(request, response, etag)
+    if not_modified:
+        return not_modified
     return book
@@ -1,19 +1,182 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo import ASCENDING, DESCENDING
 from api.security.auth import get_api_key
-from api.deps import db
+from api.cache import cache_key, response_cache
+from api.deps import get_db
+from api.http_cache import conditional, make_etag
+from api.schemas import ChangeList, ChangeOut
 
 router = APIRouter(prefix="/changes", tags=["Changes"])
 
+# seconds between Mongo polls while long-polling or streaming
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "2"))
+# seconds of silence before the stream sends an SSE comment to keep proxies from closing it
+CHANGES_STREAM_HEARTBEAT = float(os.getenv("CHANGES_STREAM_HEARTBEAT", "15"))
+CHANGES_STREAM_BATCH = 100
+
+# snapshots can be whole book documents; the feed only carries the diff
+CHANGE_PROJECTION = {"old_snapshot": 0, "new_snapshot": 0}
+
+CHANGE_TYPES = ["new", "update", "removed"]
+
+
+def parse_since(since: Optional[str]):
+    """
+    `since` is either a change `_id` (exclusive) or an ISO-8601 timestamp
+    compared against `detected_at`. Returns (after_id, detected_after).
+    """
+    if not since:
+        return None, None
+    if ObjectId.is_valid(since):
+        return ObjectId(since), None
+    try:
+        ts = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`since` must be a change id or an ISO-8601 timestamp")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return None, ts
+
+
+def change_filter(change_type=None, source_url=None, after_id=None, detected_after=None):
+    query = {}
+    if change_type:
+        query["change_type"] = change_type
+    if source_url:
+        query["source_url"] = source_url
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    if detected_after is not None:
+        query["detected_at"] = {"$gt": detected_after}
+    return query
+
+
+async def _changes_after(db, query, limit):
+    return await db.changes.find(query, CHANGE_PROJECTION).sort("_id", ASCENDING).limit(limit).to_list(None)
+
+
 @router.get(
     "/",
     summary="View recent changes",
-    description="Retrieve recent book updates such as price or availability changes.",
+    description="""
+    Retrieve book changes (new books, price or availability updates, removals).
+
+    Without `since`, returns the latest `limit` changes, newest first.
+    With `since`, returns changes recorded after it in the order they happened;
+    pass the returned `next_since` on the next call to follow the feed.
+    `wait` long-polls: an empty result is held for up to that many seconds
+    until a change arrives.
+    """,
     tags=["Changes"],
-    dependencies=[Depends(get_api_key)]
+    dependencies=[Depends(get_api_key)],
+    response_model=ChangeList,
 )
-def get_recent_changes(limit: int = 20):
+async def get_recent_changes(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=500, description="Maximum changes to return"),
+    since: Optional[str] = Query(None, description="Change id or ISO-8601 timestamp to read after"),
+    change_type: Optional[str] = Query(None, enum=CHANGE_TYPES, description="Only changes of this type"),
+    source_url: Optional[str] = Query(None, description="Only changes to this book"),
+    wait: int = Query(0, ge=0, le=60, description="Seconds to long-poll for new changes when `since` has none"),
+    db=Depends(get_db),
+):
     """View recent updates (new books or price/availability changes)."""
-    changes = list(db.changelog.find().sort("timestamp", -1).limit(limit))
-    for c in changes:
-        c["_id"] = str(c["_id"])
-    return {"count": len(changes), "changes": changes}
+    after_id, detected_after = parse_since(since)
+    query = change_filter(change_type, source_url, after_id, detected_after)
+
+    if since and wait:
+        # long-poll reads Mongo directly: changes land before the cycle bumps the generation
+        deadline = time.monotonic() + wait
+        changes = await _changes_after(db, query, limit)
+        while not changes and time.monotonic() < deadline and not await request.is_disconnected():
+            await asyncio.sleep(min(CHANGES_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+            changes = await _changes_after(db, query, limit)
+        return _change_list(changes, since)
+
+    key = cache_key("changes.recent", limit=limit, since=since, change_type=change_type, source_url=source_url)
+    generation, cached = await response_cache.lookup(db, key)
+    not_modified = conditional(request, response, make_etag(generation, key))
+    if not_modified:
+        return not_modified
+    if cached is not None:
+        return cached
+
+    if since:
+        changes = await _changes_after(db, query, limit)
+    else:
+        changes = await db.changes.find(query, CHANGE_PROJECTION).sort("_id", DESCENDING).limit(limit).to_list(None)
+    body = _change_list(changes, since)
+    response_cache.set(key, body, generation)
+    return body
+
+
+def _change_list(changes, since):
+    if changes:
+        # newest id seen, whichever order the page is in
+        next_since = str(max(c["_id"] for c in changes))
+    else:
+        next_since = since
+    return {"count": len(changes), "next_since": next_since, "changes": changes}
+
+
+async def change_events(db, query, after_id=None, is_disconnected=None,
+                        poll_interval=CHANGES_POLL_INTERVAL, heartbeat=CHANGES_STREAM_HEARTBEAT):
+    """Server-sent events for changes after `after_id`, polling an indexed `_id` range."""
+    last_sent = time.monotonic()
+    while not (is_disconnected and await is_disconnected()):
+        page_query = {**query, "_id": {"$gt": after_id}} if after_id is not None else query
+        docs = await _changes_after(db, page_query, CHANGES_STREAM_BATCH)
+        for doc in docs:
+            after_id = doc["_id"]
+            change = ChangeOut.model_validate(doc)
+            yield f"id: {change.id}\nevent: change\ndata: {change.model_dump_json()}\n\n"
+            last_sent = time.monotonic()
+        if len(docs) == CHANGES_STREAM_BATCH:
+            continue  # catching up; do not sleep between full pages
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_interval)
+
+
+@router.get(
+    "/stream",
+    summary="Stream changes",
+    description="""
+    Server-sent events: one `change` event per change as the detector records it.
+
+    Starts after `since` or the `Last-Event-ID` header when given (so a
+    reconnecting EventSource resumes where it left off), otherwise with the
+    next change recorded.
+    """,
+    tags=["Changes"],
+    dependencies=[Depends(get_api_key)],
+    response_class=StreamingResponse,
+)
+async def stream_changes(
+    request: Request,
+    since: Optional[str] = Query(None, description="Change id or ISO-8601 timestamp to start after"),
+    change_type: Optional[str] = Query(None, enum=CHANGE_TYPES, description="Only changes of this type"),
+    source_url: Optional[str] = Query(None, description="Only changes to this book"),
+    last_event_id: Optional[str] = Header(None),
+    db=Depends(get_db),
+):
+    after_id, detected_after = parse_since(last_event_id or since)
+    if after_id is None and detected_after is None:
+        latest = await db.changes.find({}, {"_id": 1}).sort("_id", DESCENDING).limit(1).to_list(None)
+        after_id = latest[0]["_id"] if latest else None
+    query = change_filter(change_type, source_url, detected_after=detected_after)
+
+    return StreamingResponse(
+        change_events(db, query, after_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
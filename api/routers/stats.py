@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from api.security.auth import get_api_key
+from api.cache import cache_key, response_cache
+from api.deps import get_db
+from api.http_cache import conditional, make_etag
+from api.schemas import CatalogueStats
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+# must match crawler.storage.STATS_ID
+STATS_ID = "catalogue"
+
+
+@router.get(
+    "/",
+    summary="Catalogue statistics",
+    description="""
+    Book counts per category and rating, a price histogram and price summary.
+
+    The aggregates are materialized by the crawler at the end of each cycle,
+    so this is a single document read.
+    """,
+    dependencies=[Depends(get_api_key)],
+    response_model=CatalogueStats,
+)
+async def get_stats(request: Request, response: Response, db=Depends(get_db)):
+    """Precomputed facet counts for category, rating and price."""
+    key = cache_key("stats")
+    generation, cached = await response_cache.lookup(db, key)
+    not_modified = conditional(request, response, make_etag(generation, key))
+    if not_modified:
+        return not_modified
+    if cached is not None:
+        return cached
+
+    stats = await db.stats.find_one({"_id": STATS_ID})
+    if not stats:
+        raise HTTPException(status_code=404, detail="Stats have not been computed yet")
+    response_cache.set(key, stats, generation)
+    return stats
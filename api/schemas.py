@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+class BookMeta(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    first_seen_at: Optional[datetime] = None
+    last_seen_at: Optional[datetime] = None
+
+
+class BookOut(BaseModel):
+    """A book as served by the API. Fields left out by a projection are omitted."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field(alias="_id")
+    source_url: Optional[str] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    price_including_tax: Optional[float] = None
+    price_excluding_tax: Optional[float] = None
+    availability: Optional[str] = None
+    num_reviews: Optional[int] = None
+    image_url: Optional[str] = None
+    rating: Optional[int] = None
+    crawl_timestamp: Optional[datetime] = None
+    content_hash: Optional[str] = None
+    raw_html_ref: Optional[str] = None
+    meta: Optional[BookMeta] = None
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_object_id(cls, v):
+        return str(v)
+
+
+class BookList(BaseModel):
+    total: Optional[int] = None
+    page: Optional[int] = None
+    page_size: int
+    next_cursor: Optional[str] = None
+    books: List[BookOut]
+
+
+class BookSearchHit(BookOut):
+    score: float
+
+
+class BookSearchList(BaseModel):
+    total: Optional[int] = None
+    page: int
+    page_size: int
+    books: List[BookSearchHit]
+
+
+class ChangeOut(BaseModel):
+    """A change record; full snapshots stay in the database."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field(alias="_id")
+    book_id: Optional[str] = None
+    source_url: Optional[str] = None
+    change_type: Literal["new", "update", "removed"]
+    changed_fields: Optional[Dict[str, Any]] = None
+    detected_at: datetime
+
+    @field_validator("id", "book_id", mode="before")
+    @classmethod
+    def _stringify_object_id(cls, v):
+        return None if v is None else str(v)
+
+
+class ChangeList(BaseModel):
+    count: int
+    next_since: Optional[str] = None
+    changes: List[ChangeOut]
+
+
+class CategoryStats(BaseModel):
+    category: Optional[str] = None
+    count: int
+    avg_price: Optional[float] = None
+
+
+class RatingStats(BaseModel):
+    rating: Optional[int] = None
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None  # None for the open-ended top bucket
+    count: int
+
+
+class PriceSummary(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    avg: Optional[float] = None
+
+
+class CatalogueStats(BaseModel):
+    total_books: int
+    categories: List[CategoryStats]
+    ratings: List[RatingStats]
+    price_buckets: List[PriceBucket]
+    price: PriceSummary
+    computed_at: datetime
+
+
+# every field a client may ask for with `fields=`
+BOOK_FIELDS = [f for f in BookOut.model_fields if f != "id"]
+# listing default: everything needed to render a result row, nothing heavy
+LIST_FIELDS = [
+    "source_url", "name", "category", "price_including_tax", "price_excluding_tax",
+    "availability", "num_reviews", "image_url", "rating", "crawl_timestamp",
+]
@@ -0,0 +1,42 @@
+import os
+import gzip
+import hashlib
+import threading
+from typing import Optional
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.getcwd(), "html_store"))
+BLOB_COMPRESS_LEVEL = int(os.getenv("BLOB_COMPRESS_LEVEL", "6"))
+
+
+def _path_for(digest: str, root: Optional[str] = None) -> str:
+    root = root or BLOB_STORE_DIR
+    return os.path.join(root, digest[:2], digest[2:4], f"{digest}.html.gz")
+
+
+def put_html(html: str, root: Optional[str] = None) -> str:
+    """
+    Store gzip-compressed HTML keyed by its SHA-256 and return the digest.
+    Identical pages across crawls map to the same file and are written once.
+    """
+    data = html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path_for(digest, root)
+    if os.path.exists(path):
+        return digest
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=BLOB_COMPRESS_LEVEL) as fh:
+        fh.write(data)
+    # atomic publish: readers never see a partially written blob
+    os.replace(tmp, path)
+    return digest
+
+
+def get_html(digest: str, root: Optional[str] = None) -> Optional[str]:
+    """Return the HTML stored under `digest`, or None if it is not in the store."""
+    try:
+        with gzip.open(_path_for(digest, root), "rb") as fh:
+            return fh.read().decode("utf-8")
+    except FileNotFoundError:
+        return None
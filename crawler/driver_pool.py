@@ -0,0 +1,163 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from .fetcher import Page
+from .rate_limit import RateLimiter
+from utils.logger import get_logger
+
+logger = get_logger()
+
+SELENIUM_POOL_SIZE = int(os.getenv("SELENIUM_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+SELENIUM_MAX_PAGES_PER_DRIVER = int(os.getenv("SELENIUM_MAX_PAGES_PER_DRIVER", "200"))
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class DriverPool:
+    """
+    Pool of warm WebDriver instances fed by a work queue.
+
+    URLs submitted to the pool are rendered by `size` worker threads, each
+    checking a driver out for one page. Drivers are health-checked on
+    checkout and recycled after `max_pages` pages to cap browser memory growth.
+    Exposes the same fetch/fetch_all interface as the HTTP fetcher, and paces
+    navigations per host through the same kind of `rate_limiter`.
+    """
+
+    def __init__(
+        self,
+        size: int = SELENIUM_POOL_SIZE,
+        max_pages: int = SELENIUM_MAX_PAGES_PER_DRIVER,
+        driver_factory: Optional[Callable] = None,
+        headless: Optional[bool] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        if driver_factory is None:
+            from .scraper import init_driver
+            driver_factory = lambda: init_driver(headless=headless)
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.rate_limiter = rate_limiter or RateLimiter(max_concurrency=self.size)
+        self._factory = driver_factory
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="driver-pool")
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(f"Driver pool started with {self.size} browsers")
+
+    def _spawn(self) -> _PooledDriver:
+        pooled = _PooledDriver(self._factory())
+        with self._lock:
+            self._all.append(pooled)
+        return pooled
+
+    def _retire(self, pooled: _PooledDriver):
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting driver: {e}")
+
+    @staticmethod
+    def _healthy(pooled: _PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _replace(self, pooled: _PooledDriver) -> _PooledDriver:
+        """Swap `pooled` for a fresh driver; keeps `pooled` if the new one cannot start."""
+        try:
+            fresh = self._spawn()
+        except Exception as e:
+            logger.error(f"Could not start a replacement driver: {type(e).__name__}: {e}")
+            return pooled
+        self._retire(pooled)
+        return fresh
+
+    def _checkout(self) -> _PooledDriver:
+        pooled = self._idle.get()
+        if self.max_pages and pooled.pages >= self.max_pages:
+            logger.info(f"Recycling driver after {pooled.pages} pages")
+            pooled = self._replace(pooled)
+        elif not self._healthy(pooled):
+            logger.warning("Replacing unhealthy driver")
+            fresh = self._replace(pooled)
+            if fresh is pooled:
+                # hand it back so the next checkout retries; the pool never shrinks
+                self._idle.put(pooled)
+                raise RuntimeError("No healthy driver available")
+            pooled = fresh
+        return pooled
+
+    def _render(self, url: str) -> Page:
+        host = self.rate_limiter.for_url(url)
+        host.acquire()
+        started = status = None
+        try:
+            try:
+                pooled = self._checkout()
+            except Exception as e:
+                return Page(url=url, error=f"{type(e).__name__}: {e}")
+            started = time.monotonic()
+            try:
+                pooled.driver.get(url)
+                html = pooled.driver.page_source
+                current_url = pooled.driver.current_url
+            except Exception as e:
+                # a driver that failed mid-page is not trusted again
+                self._idle.put(self._replace(pooled))
+                return Page(url=url, error=f"{type(e).__name__}: {e}")
+            pooled.pages += 1
+            self._idle.put(pooled)
+            # the browser hides the HTTP status; books.toscrape serves this title on 404
+            status = 404 if "Page not found" in html else 200
+            return Page(url=current_url, status_code=status, text=html)
+        finally:
+            # waiting for a driver is pool contention, not host latency: only timed renders count
+            latency = time.monotonic() - started if started is not None else None
+            host.release(latency, status=status, error=status is None)
+
+    def submit(self, url: str) -> Future:
+        """Queue a URL for rendering; the future resolves to a Page."""
+        return self._executor.submit(self._render, url)
+
+    # request headers cannot be set on a browser navigation, so `headers` is
+    # accepted for interface parity and ignored; revalidation falls back to body hashes
+    def fetch(self, url: str, headers=None) -> Page:
+        return self.submit(url).result()
+
+    def fetch_all(self, urls: List[str], headers=None) -> List[Page]:
+        futures = [self.submit(u) for u in urls]
+        return [f.result() for f in futures]
+
+    def iter_fetch(self, urls: List[str], headers=None, buffer=None):
+        """Yield (index, Page) pairs as pages finish rendering."""
+        futures = {self.submit(u): i for i, u in enumerate(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            drivers = list(self._all)
+        for pooled in drivers:
+            self._retire(pooled)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
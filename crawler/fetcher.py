@@ -0,0 +1,186 @@
+import os
+import asyncio
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from .rate_limit import RATE_LIMIT_MAX_RETRIES, THROTTLE_STATUSES, RateLimiter, parse_retry_after
+from utils.logger import get_logger
+
+logger = get_logger()
+
+FETCH_BACKEND = os.getenv("FETCH_BACKEND", "http")
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "50"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "20"))
+USER_AGENT = os.getenv("FETCH_USER_AGENT", "books-crawler/1.0 (+https://github.com/BernardWambua/books_web_crawler)")
+
+
+@dataclass
+class Page:
+    """Result of fetching a single URL, independent of the backend used."""
+    url: str
+    status_code: int = 0
+    text: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status_code < 300
+
+
+def chunked(iterable: Iterable, size: int):
+    """Yield lists of at most `size` items from `iterable`."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class HttpFetcher:
+    """
+    Concurrent fetcher backed by one pooled httpx.AsyncClient.
+
+    The public API is synchronous so the crawl loops can stay plain functions;
+    the fetcher runs a private event loop in a background thread that lives
+    as long as the fetcher, so the connection pool is reused across calls and
+    fetching keeps going while the caller is busy with earlier results.
+    Requests are paced per host by `rate_limiter`; `concurrency` is the ceiling
+    its adaptive limit works under.
+    """
+
+    def __init__(self, concurrency: int = FETCH_CONCURRENCY, timeout: float = FETCH_TIMEOUT, transport=None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter or RateLimiter(max_concurrency=self.concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=transport,
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="http-fetcher", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _fetch_one(self, url: str, headers: Optional[Dict[str, str]], semaphore: asyncio.Semaphore) -> Page:
+        host = self.rate_limiter.for_url(url)
+        async with semaphore:
+            for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+                await host.acquire_async()
+                started = time.monotonic()
+                resp = error = None
+                try:
+                    resp = await self._client.get(url, headers=headers)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                finally:
+                    if resp is not None:
+                        host.release(
+                            time.monotonic() - started,
+                            status=resp.status_code,
+                            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                        )
+                    else:
+                        # no latency to learn from when the task was cancelled mid-request
+                        host.release(time.monotonic() - started if error else None, error=True)
+                if error:
+                    return Page(url=url, error=error)
+                if resp.status_code not in THROTTLE_STATUSES or attempt == RATE_LIMIT_MAX_RETRIES:
+                    break
+                logger.warning(f"{resp.status_code} from {url}; retrying ({attempt + 1}/{RATE_LIMIT_MAX_RETRIES})")
+            return Page(
+                url=str(resp.url),
+                status_code=resp.status_code,
+                text=resp.text,
+                headers=dict(resp.headers),
+            )
+
+    async def _fetch_all(self, urls: List[str], headers: List[Optional[Dict[str, str]]]) -> List[Page]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._fetch_one(u, h, semaphore) for u, h in zip(urls, headers)))
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Page:
+        return self.fetch_all([url], [headers])[0]
+
+    def fetch_all(self, urls: List[str], headers: Optional[List[Optional[Dict[str, str]]]] = None) -> List[Page]:
+        """
+        Fetch all URLs concurrently; results keep the order of `urls`.
+        `headers`, if given, holds extra request headers per URL (e.g. conditional GET validators).
+        """
+        if not urls:
+            return []
+        urls = list(urls)
+        headers = list(headers) if headers is not None else [None] * len(urls)
+        return self._run(self._fetch_all(urls, headers)).result()
+
+    def iter_fetch(self, urls: List[str], headers=None, buffer: Optional[int] = None):
+        """
+        Yield (index, Page) pairs as responses arrive. At most `buffer` pages
+        are fetched ahead of the consumer, so a slow consumer throttles fetching.
+        """
+        urls = list(urls)
+        headers = list(headers) if headers is not None else [None] * len(urls)
+        if not urls:
+            return
+        results = queue.Queue()
+        credits = asyncio.Semaphore(buffer or self.concurrency * 2)
+
+        async def produce():
+            slots = asyncio.Semaphore(self.concurrency)
+
+            async def one(i):
+                await credits.acquire()
+                results.put((i, await self._fetch_one(urls[i], headers[i], slots)))
+
+            await asyncio.gather(*(one(i) for i in range(len(urls))))
+
+        future = self._run(produce())
+        try:
+            for _ in range(len(urls)):
+                item = results.get()
+                self._loop.call_soon_threadsafe(credits.release)
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._run(self._client.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_fetcher(backend: Optional[str] = None, headless: Optional[bool] = None):
+    """Build the fetcher selected by `backend` or the FETCH_BACKEND env var."""
+    backend = (backend or FETCH_BACKEND).lower()
+    if backend == "selenium":
+        from .driver_pool import DriverPool
+        return DriverPool(headless=headless)
+    if backend == "http":
+        return HttpFetcher()
+    raise ValueError(f"Unknown fetch backend: {backend!r}")
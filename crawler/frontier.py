@@ -0,0 +1,101 @@
+import os
+from datetime import datetime, timezone
+from typing import Iterable
+
+from .storage import get_state, set_state
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# attempts a book URL gets within one walk before it is set aside as failed
+FRONTIER_MAX_ATTEMPTS = int(os.getenv("FRONTIER_MAX_ATTEMPTS", "3"))
+
+
+class CrawlFrontier:
+    """
+    Crawl progress persisted in crawler_state so a crashed or redeployed run
+    resumes instead of starting from page 1.
+
+    Tracks the next listing page to visit, book URLs found on finished
+    listing pages but not yet processed (`pending`) and URLs handed out but
+    not yet confirmed (`in_flight`). Each checkpoint is one single-document
+    upsert, so the stored state is always a consistent snapshot. In-flight
+    URLs from an interrupted run go back to pending on load. `started_at`
+    is when the walk began, kept across resumes. URLs that fail go back to
+    pending until they have failed FRONTIER_MAX_ATTEMPTS times, then to
+    `failed`, which outlives the walk under "<key>:failed".
+    """
+
+    def __init__(self, name: str):
+        self.key = f"frontier:{name}"
+        state = get_state(self.key) or {}
+        self.next_page = state.get("next_page", 1)
+        self.pending = state.get("in_flight", []) + state.get("pending", [])
+        self.in_flight = []
+        self.started_at = state.get("started_at") or datetime.now(timezone.utc)
+        self.attempts = dict(state.get("attempts", []))
+        self.failed = state.get("failed", [])
+        if state:
+            logger.info(f"Resuming {self.key} at listing page {self.next_page} with {len(self.pending)} pending books")
+
+    def checkpoint(self):
+        set_state(self.key, {
+            "next_page": self.next_page,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "started_at": self.started_at,
+            # URLs contain dots, so not usable as document keys
+            "attempts": [[url, n] for url, n in self.attempts.items()],
+            "failed": self.failed,
+        })
+
+    def page_done(self, page_num: int, links: Iterable[str]):
+        """Record a finished listing page and queue the book URLs it yielded."""
+        self.pending.extend(link for link in links if link not in self.pending)
+        self.next_page = page_num + 1
+        self.checkpoint()
+
+    def drain(self, batch_size: int):
+        """
+        Yield pending URLs in batches. A batch counts as done once the caller
+        asks for the next one, so persist its results before continuing.
+        """
+        while self.pending:
+            batch = self.pending[:batch_size]
+            self.pending = self.pending[batch_size:]
+            self.in_flight = batch
+            self.checkpoint()
+            yield batch
+        if self.in_flight:
+            self.in_flight = []
+            self.checkpoint()
+
+    def retry(self, url: str) -> bool:
+        """
+        Put a URL whose fetch or parse failed back into pending, or set it aside
+        as failed once it used up its attempts. Checkpointed with the next batch.
+        Returns whether it will be retried.
+        """
+        attempts = self.attempts.get(url, 0) + 1
+        if attempts < FRONTIER_MAX_ATTEMPTS:
+            self.attempts[url] = attempts
+            self.pending.append(url)
+            return True
+        self.attempts.pop(url, None)
+        if url not in self.failed:
+            self.failed.append(url)
+        logger.error(f"Giving up on {url} after {attempts} attempts")
+        return False
+
+    def finish(self):
+        """
+        Forget the frontier after a complete walk; the next run starts from page 1.
+        URLs that failed in this walk are kept under "<key>:failed" until the next walk ends.
+        """
+        if self.failed:
+            logger.warning(f"{self.key}: {len(self.failed)} URLs failed, kept under {self.key}:failed")
+        set_state(f"{self.key}:failed", self.failed or None)
+        set_state(self.key, None)
+        self.next_page, self.pending, self.in_flight = 1, [], []
+        self.attempts, self.failed = {}, []
+        self.started_at = datetime.now(timezone.utc)
@@ -0,0 +1,109 @@
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from .storage import db, ensure_indexes
+from utils.logger import get_logger
+
+logger = get_logger()
+
+_OID = ObjectId("000000000000000000000000")
+_TS = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# the catalogue endpoints leave out books marked removed
+_ACTIVE = {"meta.removed_at": None}
+
+# (name, collection, filter, sort) for each query the API and crawler run.
+# Values are placeholders: only the shape matters to the planner.
+QUERY_SHAPES = [
+    ("GET /books", "books", {**_ACTIVE}, [("_id", ASCENDING)]),
+    ("GET /books?category", "books", {**_ACTIVE, "category": "x"}, [("_id", ASCENDING)]),
+    ("GET /books?category&rating&price", "books",
+     {**_ACTIVE, "category": "x", "rating": 3, "price_including_tax": {"$gte": 10, "$lte": 20}}, [("_id", ASCENDING)]),
+    ("GET /books?min_price&max_price", "books",
+     {**_ACTIVE, "price_including_tax": {"$gte": 10, "$lte": 20}}, [("_id", ASCENDING)]),
+    ("GET /books?sort_by=rating", "books", {**_ACTIVE}, [("rating", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?sort_by=price_including_tax", "books", {**_ACTIVE}, [("price_including_tax", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?sort_by=num_reviews", "books", {**_ACTIVE}, [("num_reviews", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?category&sort_by=rating", "books", {**_ACTIVE, "category": "x"}, [("rating", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?category&sort_by=price_including_tax", "books", {**_ACTIVE, "category": "x"},
+     [("price_including_tax", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?category&sort_by=num_reviews", "books", {**_ACTIVE, "category": "x"},
+     [("num_reviews", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books?sort_by=rating&cursor", "books",
+     {"$and": [_ACTIVE, {"$or": [{"rating": {"$gt": 3}}, {"rating": 3, "_id": {"$gt": _OID}}]}]}, [("rating", ASCENDING), ("_id", ASCENDING)]),
+    ("GET /books/search", "books", {"$text": {"$search": "x"}, **_ACTIVE}, None),
+    ("GET /books/search?category", "books", {"$text": {"$search": "x"}, **_ACTIVE, "category": "x"}, None),
+    ("GET /books/{id}", "books", {"_id": _OID}, None),
+    ("crawler: lookup by source_url", "books", {"source_url": "x"}, None),
+    ("crawler: active book count", "books", _ACTIVE, None),
+    ("crawler: books not listed since walk start", "books",
+     {**_ACTIVE, "meta.last_seen_at": {"$not": {"$gte": _TS}}}, None),
+    ("GET /changes", "changes", {}, [("_id", DESCENDING)]),
+    ("GET /changes?since=<id>", "changes", {"_id": {"$gt": _OID}}, [("_id", ASCENDING)]),
+    ("GET /changes?since=<timestamp>", "changes", {"detected_at": {"$gt": _TS}}, [("_id", ASCENDING)]),
+    ("GET /changes?change_type", "changes", {"change_type": "update"}, [("_id", DESCENDING)]),
+    ("GET /changes?source_url", "changes", {"source_url": "x"}, [("_id", DESCENDING)]),
+    ("changes by book", "changes", {"book_id": _OID}, [("_id", ASCENDING)]),
+    ("crawler state", "crawler_state", {"key": "x"}, None),
+]
+
+
+def plan_stages(explain):
+    """Yield every stage of the winning plan(s) in an explain() result, recursively."""
+    planner = explain.get("queryPlanner", explain)
+    roots = [planner.get("winningPlan")]
+    # sharded clusters nest one winning plan per shard
+    for shard in planner.get("winningPlan", {}).get("shards", []):
+        roots.append(shard.get("winningPlan"))
+
+    stack = [r for r in roots if r]
+    while stack:
+        stage = stack.pop()
+        # slot-based engine wraps the classic tree in queryPlan
+        if "queryPlan" in stage:
+            stack.append(stage["queryPlan"])
+        if "stage" in stage:
+            yield stage
+        if "inputStage" in stage:
+            stack.append(stage["inputStage"])
+        stack.extend(stage.get("inputStages", []))
+
+
+def find_collscans(explain):
+    """COLLSCAN stages in an explain() result; empty when every path uses an index."""
+    return [stage for stage in plan_stages(explain) if stage.get("stage") == "COLLSCAN"]
+
+
+def check_query_plans(shapes=QUERY_SHAPES):
+    """Explain each query shape and return the names of those that scan a whole collection."""
+    failing = []
+    for name, collection, query, sort in shapes:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        scans = find_collscans(cursor.limit(10).explain())
+        if scans:
+            failing.append(name)
+            logger.warning(f"COLLSCAN: {name} on {collection} with filter {query} sort {sort}")
+        else:
+            logger.info(f"ok: {name}")
+    return failing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every API/crawler query is served by an index")
+    parser.add_argument(
+        "--drop-unmanaged",
+        action="store_true",
+        help="Drop indexes that are not part of the managed set before checking.",
+    )
+    args = parser.parse_args()
+    ensure_indexes(drop_unmanaged=args.drop_unmanaged)
+    failing = check_query_plans()
+    if failing:
+        logger.error(f"{len(failing)} query shapes fall back to a collection scan")
+        sys.exit(1)
+    logger.info("All query shapes use an index")
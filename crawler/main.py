@@ -1,4 +1,26 @@
+import argparse
+
 from .scraper import crawl_books
+from .storage import bump_generation, ensure_indexes, migrate_raw_html, refresh_stats
 
 if __name__ == "__main__":
-    crawl_books()
+    parser = argparse.ArgumentParser(description="Books crawler")
+    parser.add_argument(
+        "--migrate-html",
+        action="store_true",
+        help="Move raw_html embedded in stored books into the blob store and exit.",
+    )
+    parser.add_argument(
+        "--refresh-stats",
+        action="store_true",
+        help="Recompute the catalogue aggregates served by /stats and exit.",
+    )
+    args = parser.parse_args()
+    ensure_indexes()
+    if args.migrate_html:
+        migrate_raw_html()
+    elif args.refresh_stats:
+        refresh_stats()
+        bump_generation()
+    else:
+        crawl_books()
@@ -1,33 +1,31 @@
+import os
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 from .models import Book
 
+# "bs4" (BeautifulSoup CSS selectors) or "lxml" (precompiled XPath on a raw lxml tree)
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "bs4")
+
+RATING_MAP = {"One":1,"Two":2,"Three":3,"Four":4,"Five":5}
+
 def normalize_rating(class_list):
-    mapping = {"One":1,"Two":2,"Three":3,"Four":4,"Five":5}
     for c in class_list:
-        if c in mapping:
-            return mapping[c]
+        if c in RATING_MAP:
+            return RATING_MAP[c]
     return 0
 
-def parse_book_page(html: str, url: str) -> Book:
-    soup = BeautifulSoup(html, "lxml")
-
-    name = soup.select_one("div.product_main h1").get_text(strip=True)
-    desc_el = soup.select_one("#product_description ~ p")
-    description = desc_el.get_text(strip=True) if desc_el else None
-    category = soup.select("ul.breadcrumb li a")[-1].get_text(strip=True)
-
-    table = {row.find("th").text: row.find("td").text for row in soup.select("table.table-striped tr")}
+def _build_book(url, html, name, description, category, table, image_src, rating_classes):
+    """Turn the raw strings pulled out by either backend into a Book."""
     price_incl = float(table.get("Price (incl. tax)", "£0").replace("£", ""))
     price_excl = float(table.get("Price (excl. tax)", "£0").replace("£", ""))
     availability = table.get("Availability")
     num_reviews = int(table.get("Number of reviews", "0"))
 
-    image_rel = soup.select_one("div.item.active img")["src"].replace("../..", "")
+    image_rel = image_src.replace("../..", "")
     image_url = f"https://books.toscrape.com{image_rel}"
 
-    rating_class = soup.select_one("p.star-rating")["class"]
-    mapping = {"One":1,"Two":2,"Three":3,"Four":4,"Five":5}
-    rating = next((mapping[c] for c in rating_class if c in mapping), 0)
+    rating = normalize_rating(rating_classes)
 
     return Book(
         source_url=url,
@@ -43,3 +41,156 @@ def parse_book_page(html: str, url: str) -> Book:
         raw_html=html,
     )
 
+def _build_summary(page_url, href, title, price_text, availability, rating_classes):
+    """Listing-level fields of one product_pod; fields missing from the pod are left out."""
+    summary = {"source_url": urljoin(page_url, href)}
+    if title:
+        summary["name"] = title
+    if price_text:
+        summary["price_including_tax"] = float(price_text.replace("£", ""))
+    if availability:
+        summary["availability"] = availability
+    if rating_classes:
+        summary["rating"] = normalize_rating(rating_classes)
+    return summary
+
+# --- BeautifulSoup backend ---
+
+def _parse_book_page_bs4(html: str, url: str) -> Book:
+    soup = BeautifulSoup(html, "lxml")
+
+    name = soup.select_one("div.product_main h1").get_text(strip=True)
+    desc_el = soup.select_one("#product_description ~ p")
+    description = desc_el.get_text(strip=True) if desc_el else None
+    category = soup.select("ul.breadcrumb li a")[-1].get_text(strip=True)
+
+    table = {row.find("th").text: row.find("td").text for row in soup.select("table.table-striped tr")}
+    image_src = soup.select_one("div.item.active img")["src"]
+    rating_classes = soup.select_one("p.star-rating")["class"]
+
+    return _build_book(url, html, name, description, category, table, image_src, rating_classes)
+
+def _extract_book_links_bs4(html: str, page_url: str):
+    soup = BeautifulSoup(html, "lxml")
+    return [urljoin(page_url, a.get("href")) for a in soup.select("h3 a")]
+
+def _extract_listing_summaries_bs4(html: str, page_url: str):
+    soup = BeautifulSoup(html, "lxml")
+    summaries = []
+    for pod in soup.select("article.product_pod"):
+        a = pod.select_one("h3 a")
+        if a is None:
+            continue
+        price_el = pod.select_one("p.price_color")
+        avail_el = pod.select_one("p.availability")
+        rating_el = pod.select_one("p.star-rating")
+        summaries.append(_build_summary(
+            page_url,
+            a.get("href"),
+            a.get("title") or a.get_text(strip=True),
+            price_el.get_text(strip=True) if price_el else None,
+            avail_el.get_text(strip=True) if avail_el else None,
+            rating_el["class"] if rating_el else None,
+        ))
+    return summaries
+
+# --- lxml backend ---
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_X_NAME = etree.XPath(f"(//div[{_has_class('product_main')}]//h1)[1]")
+_X_DESCRIPTION = etree.XPath("(//*[@id='product_description']/following-sibling::p)[1]")
+_X_CATEGORY = etree.XPath(f"(//ul[{_has_class('breadcrumb')}]//li//a)[last()]")
+_X_TABLE_ROWS = etree.XPath(f"//table[{_has_class('table-striped')}]//tr")
+_X_IMAGE_SRC = etree.XPath(f"(//div[{_has_class('item')}][{_has_class('active')}]//img)[1]/@src")
+_X_RATING_CLASS = etree.XPath(f"(//p[{_has_class('star-rating')}])[1]/@class")
+_X_ROW_TH = etree.XPath("(.//th)[1]")
+_X_ROW_TD = etree.XPath("(.//td)[1]")
+_X_BOOK_LINKS = etree.XPath("//h3//a")
+_X_PODS = etree.XPath(f"//article[{_has_class('product_pod')}]")
+_X_POD_LINK = etree.XPath("(.//h3//a)[1]")
+_X_POD_PRICE = etree.XPath(f"(.//p[{_has_class('price_color')}])[1]")
+_X_POD_AVAILABILITY = etree.XPath(f"(.//p[{_has_class('availability')}])[1]")
+_X_POD_RATING_CLASS = etree.XPath(f"(.//p[{_has_class('star-rating')}])[1]/@class")
+_X_TEXT = etree.XPath(".//text()")
+
+def _text(el, strip=False):
+    """Match BeautifulSoup's get_text(): descendant text nodes, comments excluded."""
+    parts = _X_TEXT(el)
+    if strip:
+        return "".join(p.strip() for p in parts)
+    return "".join(parts)
+
+def _first(nodes):
+    if not nodes:
+        raise ValueError("expected element not found")
+    return nodes[0]
+
+def _parse_book_page_lxml(html: str, url: str) -> Book:
+    tree = lxml_html.document_fromstring(html)
+
+    name = _text(_first(_X_NAME(tree)), strip=True)
+    desc_els = _X_DESCRIPTION(tree)
+    description = _text(desc_els[0], strip=True) if desc_els else None
+    category = _text(_first(_X_CATEGORY(tree)), strip=True)
+
+    table = {}
+    for row in _X_TABLE_ROWS(tree):
+        table[_text(_first(_X_ROW_TH(row)))] = _text(_first(_X_ROW_TD(row)))
+    image_src = str(_first(_X_IMAGE_SRC(tree)))
+    rating_classes = str(_first(_X_RATING_CLASS(tree))).split()
+
+    return _build_book(url, html, name, description, category, table, image_src, rating_classes)
+
+def _extract_book_links_lxml(html: str, page_url: str):
+    tree = lxml_html.document_fromstring(html)
+    return [urljoin(page_url, a.get("href")) for a in _X_BOOK_LINKS(tree)]
+
+def _extract_listing_summaries_lxml(html: str, page_url: str):
+    tree = lxml_html.document_fromstring(html)
+    summaries = []
+    for pod in _X_PODS(tree):
+        links = _X_POD_LINK(pod)
+        if not links:
+            continue
+        a = links[0]
+        price_els = _X_POD_PRICE(pod)
+        avail_els = _X_POD_AVAILABILITY(pod)
+        rating = _X_POD_RATING_CLASS(pod)
+        summaries.append(_build_summary(
+            page_url,
+            a.get("href"),
+            a.get("title") or _text(a, strip=True),
+            _text(price_els[0], strip=True) if price_els else None,
+            _text(avail_els[0], strip=True) if avail_els else None,
+            str(rating[0]).split() if rating else None,
+        ))
+    return summaries
+
+# --- public API ---
+
+_BACKENDS = {
+    "bs4": (_parse_book_page_bs4, _extract_book_links_bs4, _extract_listing_summaries_bs4),
+    "lxml": (_parse_book_page_lxml, _extract_book_links_lxml, _extract_listing_summaries_lxml),
+}
+
+def _backend(name):
+    name = (name or PARSER_BACKEND).lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name!r}")
+    return _BACKENDS[name]
+
+def parse_book_page(html: str, url: str, backend: str = None) -> Book:
+    return _backend(backend)[0](html, url)
+
+def extract_book_links(html: str, page_url: str, backend: str = None):
+    """Absolute book URLs linked from a catalogue listing page."""
+    return _backend(backend)[1](html, page_url)
+
+def extract_listing_summaries(html: str, page_url: str, backend: str = None):
+    """
+    Per-book summaries from a catalogue listing page: source_url plus the
+    name, price_including_tax, availability and rating shown on the page.
+    """
+    return _backend(backend)[2](html, page_url)
@@ -0,0 +1,132 @@
+import os
+import sys
+import atexit
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .parser import parse_book_page
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# 0 parses inline in the calling thread
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# parse jobs allowed in flight before the stage stops pulling fetched pages
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", str(max(1, PARSE_WORKERS) * 4)))
+
+
+def parse_to_doc(html: str, url: str) -> dict:
+    """
+    Parse and validate one page; runs in a worker process.
+    raw_html is left out so the page is not pickled back to the parent.
+    """
+    try:
+        return parse_book_page(html, url).model_dump(exclude={"raw_html"})
+    except Exception as e:
+        # not every parser/validation error pickles cleanly across the process boundary
+        raise ValueError(f"{type(e).__name__}: {e}") from None
+
+
+def _mp_context():
+    # the pool is created lazily, after the fetcher loop and pymongo threads are
+    # running; forking a threaded parent is unsafe, so children start clean
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _gil_disabled() -> bool:
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_enabled is not None and not is_enabled()
+
+
+class ParsePool:
+    """
+    CPU-bound parse stage. Uses a process pool, a thread pool on
+    free-threaded Python builds, or runs inline when `workers` is 0.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS):
+        self.workers = workers
+        if workers <= 0:
+            self._executor = None
+        elif _gil_disabled():
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+        else:
+            # workers only run parse_to_doc. They re-import the entry module, which is
+            # cheap: crawler.storage defers connecting and index creation to startup code.
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+
+    def submit(self, html: str, url: str) -> Future:
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(parse_to_doc(html, url))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._executor.submit(parse_to_doc, html, url)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ParsePool:
+    """Process-wide parse pool, started on first use and shut down at exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool()
+            atexit.register(_pool.close)
+            logger.info(f"Parse pool started with {_pool.workers} workers")
+        return _pool
+
+
+def fetch_and_parse(
+    fetcher,
+    urls: List[str],
+    headers: Optional[List[Optional[Dict[str, str]]]] = None,
+    should_parse: Optional[Callable] = None,
+    parse_pool: Optional[ParsePool] = None,
+    queue_size: int = PARSE_QUEUE_SIZE,
+):
+    """
+    Fetch `urls` and parse the pages in the parse pool, overlapping the two.
+
+    Yields (index, page, doc, error) in completion order, where `doc` is the
+    parsed book dict (without raw_html) or None if the page was not fetched,
+    was skipped by `should_parse(index, page)` (called for every page, failed
+    fetches included), or failed to parse (`error`).
+    The fetcher buffers a bounded number of pages ahead, and no more than
+    `queue_size` parse jobs are in flight, so each stage backs off when the
+    next one falls behind.
+    """
+    parse_pool = parse_pool or get_parse_pool()
+    in_flight = deque()
+
+    def finished(entry):
+        i, page, future = entry
+        try:
+            return i, page, future.result(), None
+        except Exception as e:
+            return i, page, None, e
+
+    for i, page in fetcher.iter_fetch(urls, headers, buffer=queue_size):
+        if (should_parse and not should_parse(i, page)) or not page.ok:
+            yield i, page, None, None
+            continue
+        in_flight.append((i, page, parse_pool.submit(page.text, urls[i])))
+        # hand back whatever is ready; block on the oldest job once the queue is full
+        while in_flight and (in_flight[0][2].done() or len(in_flight) >= queue_size):
+            yield finished(in_flight.popleft())
+
+    while in_flight:
+        yield finished(in_flight.popleft())
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# requests per second each host starts at, and the bounds AIMD keeps it within
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "5"))
+RATE_LIMIT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.5"))
+RATE_LIMIT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "20"))
+# requests a host may receive back to back before the rate applies
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+# back off when a window's mean latency (seconds) or error share goes above these
+RATE_LIMIT_TARGET_LATENCY = float(os.getenv("RATE_LIMIT_TARGET_LATENCY", "2"))
+RATE_LIMIT_MAX_ERROR_RATE = float(os.getenv("RATE_LIMIT_MAX_ERROR_RATE", "0.1"))
+# retries of a 429/503 response, and the longest Retry-After honoured (seconds)
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+RATE_LIMIT_MAX_RETRY_AFTER = float(os.getenv("RATE_LIMIT_MAX_RETRY_AFTER", "120"))
+
+THROTTLE_STATUSES = (429, 503)
+# responses per AIMD decision
+WINDOW_SIZE = 10
+# rate added per healthy window, and the factor applied on back-off
+RATE_STEP = 1.0
+DECREASE_FACTOR = 0.5
+# how often a caller re-checks for a free slot
+SLOT_WAIT = 0.05
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date); None if absent or invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - (now or datetime.now(timezone.utc))).total_seconds()
+    return min(max(0.0, seconds), RATE_LIMIT_MAX_RETRY_AFTER)
+
+
+class HostLimiter:
+    """
+    Politeness for one host: a token bucket spaces request starts, and a
+    concurrency limit caps requests in flight. Both follow AIMD: every
+    WINDOW_SIZE responses they grow additively if latency and error rate
+    stayed under target, and are halved otherwise. A 429/503 halves them at
+    once and pauses the host for its Retry-After.
+
+    Thread-safe; `acquire` blocks a worker thread, `acquire_async` awaits.
+    Every acquire must be paired with one `release`, in a `finally`.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        burst: int = RATE_LIMIT_BURST,
+        max_concurrency: int = 10,
+        min_rate: float = RATE_LIMIT_MIN_RPS,
+        max_rate: float = RATE_LIMIT_MAX_RPS,
+        target_latency: float = RATE_LIMIT_TARGET_LATENCY,
+        max_error_rate: float = RATE_LIMIT_MAX_ERROR_RATE,
+        clock=time.monotonic,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        # start halfway and let AIMD find the level the host copes with
+        self.concurrency = max(1.0, self.max_concurrency / 2)
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._next_decrease = 0.0
+        self.in_flight = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        self._count = 0
+        self._errors = 0
+        self._latency = 0.0
+
+    def reserve(self) -> Optional[float]:
+        """
+        Claim a slot and a token. Returns the seconds to wait before sending,
+        or None (nothing claimed) when the host is at its concurrency limit.
+        """
+        with self._lock:
+            if self.in_flight >= int(self.concurrency):
+                return None
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # tokens may go negative: each caller waits for its own future token
+            self._tokens -= 1
+            self.in_flight += 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def acquire(self):
+        delay = self.reserve()
+        while delay is None:
+            time.sleep(SLOT_WAIT)
+            delay = self.reserve()
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            except BaseException:
+                self.release(None)
+                raise
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        while delay is None:
+            await asyncio.sleep(SLOT_WAIT)
+            delay = self.reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:  # cancelled while waiting for the token
+                self.release(None)
+                raise
+
+    def release(self, latency: Optional[float], status: Optional[int] = None, error: bool = False,
+                retry_after: Optional[float] = None):
+        """
+        Record how a request went: `status` of the response, or `error` if none came back.
+        `latency` None frees the slot without recording anything (the request never ran).
+        """
+        throttled = status in THROTTLE_STATUSES
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if latency is None:
+                return
+            now = self._clock()
+            if throttled:
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                # responses already in flight were sent at the old rate; back off once for them
+                if now >= self._next_decrease:
+                    self._decrease()
+                    self._next_decrease = now + max(retry_after or 0.0, self.target_latency)
+                return
+
+            self._count += 1
+            self._latency += latency
+            if error or (status is not None and status >= 500):
+                self._errors += 1
+            if self._count < WINDOW_SIZE:
+                return
+            if self._errors / self._count > self.max_error_rate or self._latency / self._count > self.target_latency:
+                self._decrease()
+            else:
+                self.rate = min(self.max_rate, self.rate + RATE_STEP)
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 1)
+            self._reset_window()
+
+    def _decrease(self):
+        self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+        self.concurrency = max(1.0, self.concurrency * DECREASE_FACTOR)
+        self._tokens = min(self._tokens, 0.0)
+        self._reset_window()
+        logger.warning(f"Backing off: {self.rate:.2f} req/s, {int(self.concurrency)} in flight")
+
+
+class RateLimiter:
+    """One HostLimiter per host, created on first use with the same settings."""
+
+    def __init__(self, **host_settings):
+        self._settings = host_settings
+        self._hosts: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limiter = self._hosts[host] = HostLimiter(**self._settings)
+            return limiter
@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from .fetcher import Page
+
+VALIDATORS_FIELD = "http_validators"
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def validators_from_page(page: Page) -> Dict[str, Optional[str]]:
+    """Capture what we need to revalidate this page on the next crawl."""
+    headers = {k.lower(): v for k, v in page.headers.items()}
+    return {
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "body_hash": body_hash(page.text),
+    }
+
+
+def conditional_headers(doc: Dict[str, Any]) -> Dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers from a stored book doc."""
+    validators = doc.get(VALIDATORS_FIELD) or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def is_unchanged(doc: Dict[str, Any], page: Page) -> bool:
+    """True when the server answered 304 or served the exact body we hashed last time."""
+    if page.error is None and page.status_code == 304:
+        return True
+    stored = (doc.get(VALIDATORS_FIELD) or {}).get("body_hash")
+    return bool(stored) and page.ok and body_hash(page.text) == stored
@@ -1,64 +1,111 @@
 import os
-import time
-import hashlib
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from .parser import parse_book_page
-from .storage import upsert_book_doc as upsert_book
+from .fetcher import FETCH_BATCH_SIZE, get_fetcher
+from .frontier import CrawlFrontier
+from .parser import extract_book_links
+from .pipeline import fetch_and_parse
+from .revalidation import VALIDATORS_FIELD, validators_from_page
+from .storage import BulkWriter, bump_generation, refresh_stats
+from utils.fingerprint import field_hashes, fingerprint
+from utils.hash_utils import FIELD_HASHES
 from utils.logger import get_logger
 
 logger = get_logger()
 
-def init_driver():
+def init_driver(headless=None):
+    if headless is None:
+        headless = os.getenv("SELENIUM_HEADLESS", "True").lower() == "true"
     opts = Options()
-    if os.getenv("SELENIUM_HEADLESS", "True").lower() == "true":
+    if headless:
         opts.add_argument("--headless=new")
     opts.add_argument("--disable-gpu")
     opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
     opts.add_argument("--window-size=1920,1080")
     driver = webdriver.Chrome(options=opts)
     return driver
 
-def crawl_books(base_url="https://books.toscrape.com"):
-    driver = init_driver()
-    page_num = 1
+def listing_page_url(base_url, page_num):
+    return f"{base_url}/catalogue/page-{page_num}.html" if page_num > 1 else base_url
 
-    try:
-        while True:
-            page_url = f"{base_url}/catalogue/page-{page_num}.html" if page_num > 1 else base_url
-            logger.info(f"Scraping page {page_num}: {page_url}")
-            driver.get(page_url)
-            time.sleep(1)
+class ListingFetchError(RuntimeError):
+    """A listing page could not be fetched; the walk stopped before the last page."""
+
+def iter_listing_pages(fetcher, base_url="https://books.toscrape.com", start_page=1, extract=extract_book_links):
+    """
+    Walk catalogue listing pages from `start_page`, yielding (page_num, page_url, items)
+    where items is what `extract(html, page_url)` returns: book links by default,
+    or per-book summaries with parser.extract_listing_summaries.
+    """
+    page_num = start_page
+    while True:
+        page_url = listing_page_url(base_url, page_num)
+        logger.info(f"Scraping page {page_num}: {page_url}")
+        page = fetcher.fetch(page_url)
+
+        if page.status_code == 404:
+            logger.info("No more pages found.")
+            break
+        if not page.ok:
+            raise ListingFetchError(f"Failed to fetch listing page {page_url}: {page.error or page.status_code}")
 
-            if "Page not found" in driver.page_source:
-                logger.info("No more pages found.")
-                break
+        items = extract(page.text, page.url)
+        if not items:
+            logger.info("No books found on this page.")
+            break
 
-            soup = BeautifulSoup(driver.page_source, "lxml")
-            book_links = [
-                urljoin(driver.current_url, a.get("href"))
-                for a in soup.select("h3 a")
-            ]
-            if not book_links:
-                logger.info("No books found on this page.")
-                break
+        yield page_num, page_url, items
+        page_num += 1
 
-            for link in book_links:
-                try:
-                    driver.get(link)
-                    driver.implicitly_wait(1)
-                    html = driver.page_source
-                    book = parse_book_page(html, link)
-                    upsert_book(book.model_dump())
-                    logger.info(f"Saved book: {book.name}")
-                except Exception as e:
-                    logger.error(f"Error parsing {link}: {e}")
+def crawl_books(base_url="https://books.toscrape.com", fetcher=None, writer=None):
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = get_fetcher()
+    own_writer = writer is None
+    if own_writer:
+        writer = BulkWriter()
+    frontier = CrawlFrontier("crawl_books")
+
+    def crawl_pending():
+        for batch in frontier.drain(FETCH_BATCH_SIZE):
+            for i, page, book, error in fetch_and_parse(fetcher, batch):
+                link = batch[i]
+                if not page.ok:
+                    logger.error(f"Error fetching {link}: {page.error or page.status_code}")
+                    frontier.retry(link)
+                    continue
+                if error:
+                    logger.error(f"Error parsing {link}: {error}")
+                    frontier.retry(link)
                     continue
+                writer.upsert_book({
+                    **book,
+                    "raw_html": page.text,
+                    VALIDATORS_FIELD: validators_from_page(page),
+                    # change detection starts from this state instead of treating every book as changed
+                    "content_hash": fingerprint(book),
+                    FIELD_HASHES: field_hashes(book),
+                })
+                logger.info(f"Saved book: {book['name']}")
+            # the frontier marks this batch done when the next one is requested
+            writer.flush()
 
-            page_num += 1
+    try:
+        # books left over from an interrupted run come first
+        crawl_pending()
+        for page_num, _, book_links in iter_listing_pages(fetcher, base_url, frontier.next_page):
+            frontier.page_done(page_num, book_links)
+            crawl_pending()
+        frontier.finish()
+    except ListingFetchError as e:
+        logger.error(f"{e}; progress saved, the next run resumes from page {frontier.next_page}")
 
     finally:
-        driver.quit()
+        if own_writer:
+            writer.close()
+            # callers sharing a writer refresh once they have flushed it themselves
+            refresh_stats()
+            bump_generation()
+        if own_fetcher:
+            fetcher.close()
@@ -1,10 +1,12 @@
 import os
+import time
 from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, TEXT, IndexModel, InsertOne, UpdateOne
 from datetime import datetime, timezone
 from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
-from bson import json_util
+from .blob_store import put_html
 from utils.logger import get_logger
 
 logger = get_logger()
@@ -12,61 +14,343 @@ load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "books_crawler")
+BULK_FLUSH_SIZE = int(os.getenv("BULK_FLUSH_SIZE", "500"))
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "5"))
+# lower edges of the price histogram served by /stats; the last bucket is open-ended
+STATS_PRICE_BUCKETS = [float(b) for b in os.getenv("STATS_PRICE_BUCKETS", "0,10,20,30,40,50,60").split(",")]
 
-client = MongoClient(MONGO_URI)
+# connect=False: no sockets or monitor threads until the first operation, so
+# importing this module (e.g. when a parse worker re-imports the entry point) stays free
+client = MongoClient(MONGO_URI, connect=False)
 db = client[MONGO_DB]
 books_coll = db["books"]
 changes_coll = db["changes"]
 state_coll = db["crawler_state"]
+stats_coll = db["stats"]
 
-# indexes
-books_coll.create_index([("source_url", ASCENDING)], unique=True)
-books_coll.create_index([("category", ASCENDING)])
-books_coll.create_index([("price_including_tax", ASCENDING)])
-changes_coll.create_index([("detected_at", ASCENDING)])
-state_coll.create_index([("key", ASCENDING)], unique=True)
-
-def upsert_book_doc(book_data):
-    """Insert or update a book document safely in MongoDB."""
-
-    # Convert any non-serializable fields to JSON-safe dicts
-    try:
-        safe_data = json_util.loads(json_util.dumps(book_data))
-    except Exception as e:
-        logger.error(f"Failed to serialize book data for {book_data.get('source_url')}: {e}")
-        return None
-
-    try:
-        result = books_coll.find_one_and_update(
-            {"source_url": safe_data["source_url"]},
-            {"$set": safe_data},
-            upsert=True,
-            return_document=ReturnDocument.AFTER,
-        )
-        return result
-    except Exception as e:
-        logger.exception(f"Mongo upsert failed for {safe_data.get('source_url')}: {e}")
-        return None
+# Managed index set, derived from the query shapes the crawler and API run
+# (checked against real plans by `python -m crawler.index_advisor`).
+# Sorts always end in _id so keyset pagination has a total order; filters
+# follow equality -> sort -> range.
+INDEXES = {
+    "books": [
+        IndexModel([("source_url", ASCENDING)], unique=True),
+        # category / rating equality with a price range; the category prefix serves category-only filters
+        IndexModel([("category", ASCENDING), ("rating", ASCENDING), ("price_including_tax", ASCENDING)]),
+        # GET /books?sort_by=... with and without a category filter
+        IndexModel([("price_including_tax", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("rating", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("num_reviews", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("price_including_tax", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("num_reviews", ASCENDING), ("_id", ASCENDING)]),
+        # GET /books/search; title matches outrank description matches
+        IndexModel(
+            [("name", TEXT), ("description", TEXT)],
+            name="book_text",
+            weights={"name": 10, "description": 1},
+            default_language="english",
+        ),
+        # removal check after a catalogue walk: active books not listed since it started
+        IndexModel([("meta.removed_at", ASCENDING), ("meta.last_seen_at", ASCENDING)]),
+    ],
+    "changes": [
+        IndexModel([("detected_at", ASCENDING)]),
+        # filtered reads of the /changes feed walk _id in order
+        IndexModel([("change_type", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("source_url", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("book_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "crawler_state": [
+        IndexModel([("key", ASCENDING)], unique=True),
+    ],
+}
+
+def ensure_indexes(drop_unmanaged=False):
+    """
+    Create the managed indexes; optionally drop any others (e.g. superseded single-field ones).
+    Called once by each entry point at startup, not on import.
+    """
+    for name, models in INDEXES.items():
+        coll = db[name]
+        created = coll.create_indexes(models)
+        if not drop_unmanaged:
+            continue
+        managed = set(created) | {"_id_"}
+        for index_name in list(coll.index_information()):
+            if index_name not in managed:
+                logger.info(f"Dropping unmanaged index {name}.{index_name}")
+                coll.drop_index(index_name)
+
+def externalize_html(doc):
+    """Return a copy of `doc` with raw_html moved to the blob store and replaced by raw_html_ref."""
+    if not doc or "raw_html" not in doc:
+        return doc
+    doc = dict(doc)
+    html = doc.pop("raw_html")
+    if html:
+        doc["raw_html_ref"] = put_html(html)
+    return doc
+
+def _book_update(book_data):
+    """$set/$unset for a book; _id is immutable and raw HTML lives in the blob store."""
+    fields = externalize_html({k: v for k, v in book_data.items() if k != "_id"})
+    return {"$set": fields, "$unset": {"raw_html": ""}}
 
-def get_all_books():
-    """Return a cursor for all book documents (lightweight fields)."""
-    return books_coll.find({})
+# books not marked removed (meta.removed_at unset or null)
+ACTIVE_BOOKS = {"meta.removed_at": None}
 
-def get_book_by_source_url(url: str):
-    return books_coll.find_one({"source_url": url})
+def count_active_books():
+    return books_coll.count_documents(ACTIVE_BOOKS)
 
-def record_change(book_id, source_url, change_type, changed_fields, old_doc, new_doc):
-    payload = {
+def get_unseen_books(since):
+    """source_url -> _id for active books not seen (listed) since `since`, or never."""
+    cursor = books_coll.find(
+        {**ACTIVE_BOOKS, "meta.last_seen_at": {"$not": {"$gte": since}}},
+        {"source_url": 1},
+    )
+    return {doc["source_url"]: doc["_id"] for doc in cursor}
+
+def get_books_by_source_urls(urls, projection=None):
+    """Stored books for `urls` (one indexed $in query), keyed by source_url."""
+    return {d["source_url"]: d for d in books_coll.find({"source_url": {"$in": list(urls)}}, projection)}
+
+def touch_books(book_ids):
+    """Mark books as seen now without rewriting them (one round-trip for the whole batch)."""
+    if not book_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    result = books_coll.update_many(
+        {"_id": {"$in": list(book_ids)}},
+        {"$set": {"meta.last_seen_at": now}},
+    )
+    return result.modified_count
+
+def _change_payload(book_id, source_url, change_type, changed_fields):
+    """
+    Delta-only change record: `changed_fields` maps field -> {"old", "new"}; no document snapshots.
+    The _id is assigned when the record is written (see BulkWriter.flush).
+    """
+    return {
         "book_id": ObjectId(book_id) if not isinstance(book_id, ObjectId) else book_id,
         "source_url": source_url,
         "change_type": change_type,  # "new" | "update" | "removed"
         "changed_fields": changed_fields,
-        "old_snapshot": old_doc,
-        "new_snapshot": new_doc,
         "detected_at": datetime.now(timezone.utc)
     }
-    changes_coll.insert_one(payload)
-    return payload
+
+class BulkWriter:
+    """
+    Buffers book upserts and change records and writes them with bulk_write
+    calls: unordered for books, ordered for change records.
+
+    Change ids are assigned at flush and inserted in order, so once a change
+    is visible every change with a smaller id from this writer is too; the
+    feed's `since` cursor relies on that. Run one writing scheduler at a time:
+    ids from concurrent writers can interleave.
+
+    A flush happens when `flush_size` operations are pending or
+    `flush_interval` seconds have passed since the last flush, and on close().
+    Failed items are logged individually and collected in `errors`.
+    Use as a context manager so the final flush runs on shutdown.
+    """
+
+    def __init__(self, flush_size=BULK_FLUSH_SIZE, flush_interval=BULK_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._book_ops = []
+        self._book_urls = []
+        self._changes = []
+        self._last_flush = time.monotonic()
+        self.errors = []
+
+    def upsert_book(self, book_data):
+        """
+        Queue an upsert keyed on source_url and return the book's _id.
+        For books without an _id one is allocated up front so change records
+        can reference it before the flush; it only applies if the upsert inserts.
+        """
+        book_id = book_data.get("_id") or ObjectId()
+        self._book_ops.append(UpdateOne(
+            {"source_url": book_data["source_url"]},
+            {**_book_update(book_data), "$setOnInsert": {"_id": book_id}},
+            upsert=True,
+        ))
+        self._book_urls.append(book_data["source_url"])
+        self._maybe_flush()
+        return book_id
+
+    def update_book(self, book_id, fields, source_url=None):
+        """
+        Queue a $set of only `fields` on an existing book. Keys may be dotted
+        paths (e.g. "meta.last_seen_at"); raw_html goes to the blob store.
+        """
+        update = {"$set": externalize_html(fields)}
+        if "raw_html" in fields:
+            update["$unset"] = {"raw_html": ""}
+        self._book_ops.append(UpdateOne({"_id": book_id}, update))
+        self._book_urls.append(source_url or str(book_id))
+        self._maybe_flush()
+
+    def record_change(self, book_id, source_url, change_type, changed_fields):
+        payload = _change_payload(book_id, source_url, change_type, changed_fields)
+        self._changes.append(payload)
+        self._maybe_flush()
+        return payload
+
+    @property
+    def pending(self):
+        return len(self._book_ops) + len(self._changes)
+
+    def _maybe_flush(self):
+        if self.pending >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write(self, coll, ops, labels, ordered=False):
+        if not ops:
+            return 0
+        try:
+            result = coll.bulk_write(ops, ordered=ordered)
+            return result.upserted_count + result.modified_count + result.inserted_count
+        except BulkWriteError as e:
+            details = e.details
+            errors = details.get("writeErrors", [])
+            for err in errors:
+                label = labels[err["index"]]
+                logger.error(f"Bulk write to {coll.name} failed for {label}: {err.get('errmsg')}")
+                self.errors.append({"collection": coll.name, "item": label, "error": err.get("errmsg")})
+            if ordered and errors:
+                # an ordered write stops at the first error
+                skipped = labels[errors[0]["index"] + 1:]
+                if skipped:
+                    logger.error(f"Bulk write to {coll.name} stopped; {len(skipped)} items not written")
+                self.errors.extend({"collection": coll.name, "item": label, "error": "not written"} for label in skipped)
+            return details.get("nUpserted", 0) + details.get("nModified", 0) + details.get("nInserted", 0)
+        except Exception as e:
+            logger.exception(f"Bulk write to {coll.name} failed: {e}")
+            self.errors.extend({"collection": coll.name, "item": label, "error": str(e)} for label in labels)
+            return 0
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of documents written."""
+        book_ops, book_urls = self._book_ops, self._book_urls
+        changes = self._changes
+        self._book_ops, self._book_urls, self._changes = [], [], []
+        self._last_flush = time.monotonic()
+
+        written = self._write(books_coll, book_ops, book_urls)
+        for c in changes:
+            c["_id"] = ObjectId()
+        written += self._write(
+            changes_coll,
+            [InsertOne(c) for c in changes],
+            [f"{c['change_type']} {c['source_url']}" for c in changes],
+            ordered=True,
+        )
+        if book_ops or changes:
+            logger.debug(f"Flushed {len(book_ops)} book upserts and {len(changes)} change records")
+        return written
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def migrate_raw_html(batch_size=BULK_FLUSH_SIZE):
+    """
+    Move raw_html still embedded in stored books into the blob store, and drop
+    the copies in snapshots of old change records. Returns books migrated.
+    """
+    migrated = 0
+    cursor = books_coll.find({"raw_html": {"$exists": True}}, {"raw_html": 1})
+    ops = []
+    for doc in cursor:
+        update = {"$unset": {"raw_html": ""}}
+        if doc.get("raw_html"):
+            update["$set"] = {"raw_html_ref": put_html(doc["raw_html"])}
+        ops.append(UpdateOne({"_id": doc["_id"]}, update))
+        if len(ops) >= batch_size:
+            migrated += books_coll.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        migrated += books_coll.bulk_write(ops, ordered=False).modified_count
+    logger.info(f"Moved raw_html of {migrated} books to the blob store")
+    # records written before changes became delta-only carry whole book snapshots
+    snapshots = changes_coll.update_many(
+        {"$or": [{"old_snapshot.raw_html": {"$exists": True}}, {"new_snapshot.raw_html": {"$exists": True}}]},
+        {"$unset": {"old_snapshot.raw_html": "", "new_snapshot.raw_html": ""}},
+    )
+    logger.info(f"Dropped raw_html from the snapshots of {snapshots.modified_count} change records")
+    return migrated
+
+STATS_ID = "catalogue"
+
+def _stats_pipeline(boundaries):
+    price = "$price_including_tax"
+    return [{"$match": ACTIVE_BOOKS}, {"$facet": {
+        "total": [{"$count": "n"}],
+        "categories": [
+            {"$group": {"_id": "$category", "count": {"$sum": 1}, "avg_price": {"$avg": price}}},
+            {"$sort": {"_id": 1}},
+        ],
+        "ratings": [
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ],
+        "price_buckets": [
+            {"$match": {"price_including_tax": {"$type": "number"}}},
+            # prices past the last edge land in the open-ended last bucket
+            {"$bucket": {"groupBy": price, "boundaries": boundaries,
+                         "default": boundaries[-1], "output": {"count": {"$sum": 1}}}},
+        ],
+        "price": [
+            {"$group": {"_id": None, "min": {"$min": price}, "max": {"$max": price}, "avg": {"$avg": price}}},
+        ],
+    }}]
+
+def refresh_stats(boundaries=None):
+    """Recompute catalogue aggregates in one pass and store them for /stats. Returns the stats doc."""
+    boundaries = sorted(boundaries or STATS_PRICE_BUCKETS)
+    if len(boundaries) < 2:
+        raise ValueError("STATS_PRICE_BUCKETS needs at least two bucket edges")
+    facets = next(books_coll.aggregate(_stats_pipeline(boundaries)))
+
+    counts = {b["_id"]: b["count"] for b in facets["price_buckets"]}
+    price = facets["price"][0] if facets["price"] else {}
+    stats = {
+        "_id": STATS_ID,
+        "total_books": facets["total"][0]["n"] if facets["total"] else 0,
+        "categories": [
+            {"category": c["_id"], "count": c["count"], "avg_price": c["avg_price"]}
+            for c in facets["categories"]
+        ],
+        "ratings": [{"rating": r["_id"], "count": r["count"]} for r in facets["ratings"]],
+        "price_buckets": [
+            {"min": low, "max": boundaries[i + 1] if i + 1 < len(boundaries) else None, "count": counts.get(low, 0)}
+            for i, low in enumerate(boundaries)
+        ],
+        "price": {"min": price.get("min"), "max": price.get("max"), "avg": price.get("avg")},
+        "computed_at": datetime.now(timezone.utc),
+    }
+    stats_coll.replace_one({"_id": STATS_ID}, stats, upsert=True)
+    logger.info(f"Refreshed catalogue stats over {stats['total_books']} books")
+    return stats
+
+# bumped after every crawl that writes; the API drops cached responses when it moves
+GENERATION_KEY = "data_generation"
+
+def bump_generation():
+    doc = state_coll.find_one_and_update(
+        {"key": GENERATION_KEY},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    logger.info(f"Data generation is now {doc['value']}")
+    return doc["value"]
 
 def set_state(key, value):
     state_coll.update_one({"key": key}, {"$set": {"value": value}}, upsert=True)
@@ -1,113 +1,374 @@
-import time
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from urllib.parse import urljoin
+import os
 from datetime import datetime, timezone
-from utils.hash_utils import fingerprint_book
+from utils.fingerprint import (
+    field_hash_matches, field_hashes, fingerprint, fingerprint_many, fingerprint_matches, is_legacy,
+)
+from utils.hash_utils import FIELD_HASHES, TRACKED_FIELDS
+from crawler.fetcher import FETCH_BATCH_SIZE, chunked, get_fetcher
+from crawler.parser import extract_listing_summaries
+from crawler.revalidation import (
+    VALIDATORS_FIELD,
+    conditional_headers,
+    is_unchanged,
+    validators_from_page,
+)
+from crawler.frontier import CrawlFrontier
 from crawler.storage import (
-    get_all_books,
-    get_book_by_source_url,
-    upsert_book_doc,
-    record_change,
+    BulkWriter,
+    count_active_books,
+    get_books_by_source_urls,
+    get_state,
+    get_unseen_books,
+    set_state,
+    touch_books,
 )
-from crawler.parser import parse_book_page
+from crawler.pipeline import fetch_and_parse
+from crawler.scraper import ListingFetchError, iter_listing_pages
 from utils.logger import get_logger
-import os
 
 logger = get_logger()
 
-def init_driver(headless=True):
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--disable-dev-shm-usage")
-    opts.add_argument("--window-size=1920,1080")
-    driver = webdriver.Chrome(options=opts)
-    return driver
-
-def detect_changes(run_headless=True, alert_threshold_pct=5):
+# long text is compared through its stored hash only, so its value is never transferred
+HASH_ONLY_FIELDS = {"description"}
+# the per-book detection state: field hashes plus the last values of the short tracked fields
+# the listing summary last verified against the detail page
+LISTING_FIELD = "listing"
+DETECTION_PROJECTION = ["_id", "source_url", "content_hash", "meta.removed_at", LISTING_FIELD, FIELD_HASHES,
+                        VALIDATORS_FIELD] + [
+    f for f in TRACKED_FIELDS if f not in HASH_ONLY_FIELDS
+]
+BASE_URL = os.getenv("BASE_URL", "https://books.toscrape.com")
+# refuse to mark more than this share of the catalogue removed in one pass
+REMOVAL_MAX_FRACTION = float(os.getenv("REMOVAL_MAX_FRACTION", "0.2"))
+# listing mode still runs a full pass this often (days; 0 disables), for changes listings do not show
+FULL_PASS_INTERVAL_DAYS = float(os.getenv("FULL_PASS_INTERVAL_DAYS", "7"))
+FULL_PASS_KEY = "catalogue:last_full_pass"
+
+def sync_catalogue(fetcher=None, writer=None, full=False, alert_threshold_pct=5, base_url=BASE_URL):
     """
-    Iterate existing books in DB, re-fetch pages and detect changes.
-    Returns list of change records (inserted into DB).
+    One walk over the catalogue listing pages that both discovers and detects.
+
+    Each listed book is classified from its listing summary (name, price,
+    availability, rating) and the stored state:
+      new        not stored yet: fetched, parsed and inserted
+      changed    summary differs from the stored values (every listed book
+                 when `full`): re-fetched conditionally and diffed
+      unchanged  only last_seen_at is touched
+      missing    stored but not listed since the walk started: a "removed"
+                 record, emitted only after a complete walk
+    Changes that do not show on listings (description, review count, exact
+    stock count) are only caught with `full`.
+    Progress is checkpointed per listing page, so an interrupted walk resumes
+    where it stopped on the next call.
+    Returns list of change records, "new" and "removed" ones included.
     """
-    driver = init_driver(headless=run_headless)
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = get_fetcher()
+    own_writer = writer is None
+    if own_writer:
+        writer = BulkWriter()
     changes_report = []
+    fetched = skipped = 0
+    frontier = CrawlFrontier("catalogue:full" if full else "catalogue")
+    seen = set()
 
     try:
-        cursor = get_all_books()
-        for old_doc in cursor:
-            source_url = old_doc.get("source_url")
-            logger.info(f"Checking {source_url}")
-            try:
-                driver.get(source_url)
-                time.sleep(0.6)
-                html = driver.page_source
-                # parse into Book model (pydantic) using your parser
-                try:
-                    new_book = parse_book_page(html, source_url)
-                except Exception as e:
-                    logger.error(f"Failed to parse {source_url}: {e}")
+        pages = iter_listing_pages(fetcher, base_url, frontier.next_page, extract=extract_listing_summaries)
+        for page_num, _, summaries in pages:
+            stored = get_books_by_source_urls([s["source_url"] for s in summaries], DETECTION_PROJECTION)
+            stale, listings, new_links, fresh_ids = [], [], [], []
+            for summary in summaries:
+                url = summary["source_url"]
+                if url in seen:
+                    continue  # listed twice (e.g. the catalogue shifted mid-walk)
+                seen.add(url)
+                doc = stored.get(url)
+                if doc is None:
+                    new_links.append((url, listing_fields(summary)))
                     continue
+                if (doc.get("meta") or {}).get("removed_at"):
+                    changes_report.append(_restore(writer, doc))
+                    stale.append(doc)
+                elif full or summary_changed(doc, summary):
+                    stale.append(doc)
+                else:
+                    fresh_ids.append(doc["_id"])
+                    continue
+                listings.append({LISTING_FIELD: listing_fields(summary)})
 
-                # new_book is Pydantic model; get dict
-                new_doc = new_book.model_dump()
-                new_doc["raw_html"] = html
-                new_doc["crawl_timestamp"] = datetime.now(timezone.utc)
-
-                # compute fingerprints
-                old_fp = old_doc.get("content_hash") or ""
-                new_fp = fingerprint_book(new_doc)
-
-                if old_fp != new_fp:
-                    # identify changed fields (field-level diff)
-                    changed_fields = {}
-                    fields_to_compare = ["price_including_tax", "price_excluding_tax", "availability", "num_reviews", "rating", "name"]
-                    for f in fields_to_compare:
-                        old_v = old_doc.get(f)
-                        new_v = new_doc.get(f)
-                        if old_v != new_v:
-                            changed_fields[f] = {"old": old_v, "new": new_v}
-                    change_type = "update"
-                    # record change
-                    rec = record_change(old_doc["_id"], source_url, change_type, changed_fields, old_doc, new_doc)
-                    # update book doc (set new fields + new fingerprint)
-                    new_doc["content_hash"] = new_fp
-                    new_doc["meta"] = old_doc.get("meta", {})
-                    new_doc["meta"]["first_seen_at"] = old_doc.get("meta", {}).get("first_seen_at")
-                    new_doc["meta"]["last_seen_at"] = datetime.now(timezone.utc)
-                    upsert_book_doc(new_doc)
-                    changes_report.append(rec)
-
-                    # alerting: price drop percent OR availability toggle
-                    try:
-                        old_price = old_doc.get("price_including_tax") or 0.0
-                        new_price = new_doc.get("price_including_tax") or 0.0
-                        if old_price and new_price:
-                            pct = (old_price - new_price) / old_price * 100
-                            if pct >= alert_threshold_pct:
-                                logger.warning(f"PRICE DROP ALERT: {source_url} dropped {pct:.2f}% from {old_price} to {new_price}")
-                        old_avail = old_doc.get("availability")
-                        new_avail = new_doc.get("availability")
-                        if old_avail != new_avail:
-                            logger.warning(f"AVAILABILITY CHANGED: {source_url}: '{old_avail}' -> '{new_avail}'")
-                    except Exception as e:
-                        logger.error(f"Error computing alerts for {source_url}: {e}")
+            changes_report.extend(recheck_books(fetcher, writer, stale, alert_threshold_pct, listings))
+            changes_report.extend(insert_new_books(fetcher, writer, [url for url, _ in new_links],
+                                                   [{LISTING_FIELD: listing} for _, listing in new_links]))
+            writer.flush()
+            # listed means seen, whether or not the detail page could be fetched
+            touch_books(fresh_ids + [d["_id"] for d in stale])
+            frontier.page_done(page_num, [])
+            fetched += len(stale) + len(new_links)
+            skipped += len(fresh_ids)
 
-                else:
-                    # no change — update last_seen + crawl_timestamp
-                    upsert_book_doc({
-                        **old_doc,
-                        "crawl_timestamp": datetime.now(timezone.utc),
-                        "content_hash": new_fp,
-                        "meta": {**old_doc.get("meta", {}), "last_seen_at": datetime.now(timezone.utc)}
-                    })
-            except Exception as e:
-                logger.error(f"Error fetching {source_url}: {e}")
-                continue
+        logger.info(f"Catalogue pass: {fetched} detail pages fetched, {skipped} books unchanged on listings")
+        changes_report.extend(_record_removed(writer, frontier.started_at))
+        if full:
+            set_state(FULL_PASS_KEY, frontier.started_at)
+        frontier.finish()
+    except ListingFetchError as e:
+        # a partial walk cannot tell removed books from unvisited ones
+        logger.error(f"{e}; catalogue pass resumes from page {frontier.next_page} next cycle, removals not checked")
 
     finally:
-        driver.quit()
+        if own_writer:
+            writer.close()
+        if own_fetcher:
+            fetcher.close()
 
     return changes_report
+
+
+def full_pass_due(now=None):
+    """Whether the last complete full pass is older than FULL_PASS_INTERVAL_DAYS (or never ran)."""
+    if FULL_PASS_INTERVAL_DAYS <= 0:
+        return False
+    last = get_state(FULL_PASS_KEY)
+    if last is None:
+        return True
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)  # Mongo hands datetimes back naive (UTC)
+    now = now or datetime.now(timezone.utc)
+    return (now - last).total_seconds() >= FULL_PASS_INTERVAL_DAYS * 86400
+
+
+def _restore(writer, doc):
+    """A book marked removed is listed again."""
+    logger.info(f"Book listed again: {doc['source_url']}")
+    writer.update_book(doc["_id"], {"meta.removed_at": None}, doc["source_url"])
+    return writer.record_change(doc["_id"], doc["source_url"], "update", {"removed": {"old": True, "new": False}})
+
+
+def _record_removed(writer, walk_started_at):
+    """Mark active books not listed since a complete walk started as removed; returns their change records."""
+    missing = get_unseen_books(walk_started_at)
+    if not missing:
+        return []
+    active = count_active_books()
+    if len(missing) > REMOVAL_MAX_FRACTION * active:
+        # more likely a broken walk (layout change, empty catalogue page) than a mass delisting
+        logger.error(
+            f"{len(missing)} of {active} stored books were not listed; "
+            f"above REMOVAL_MAX_FRACTION={REMOVAL_MAX_FRACTION}, not marking them removed"
+        )
+        return []
+
+    now = datetime.now(timezone.utc)
+    records = []
+    for url, book_id in missing.items():
+        logger.warning(f"Book no longer listed: {url}")
+        writer.update_book(book_id, {"meta.removed_at": now}, url)
+        records.append(writer.record_change(book_id, url, "removed", {"removed": {"old": False, "new": True}}))
+    writer.flush()
+    return records
+
+
+def _listing_availability(value):
+    """Listings show "In stock"; detail pages add the count: "In stock (22 available)"."""
+    return value.split("(", 1)[0].strip() if value else value
+
+def listing_fields(summary):
+    """The fields a listing summary shows, without its URL."""
+    return {f: v for f, v in summary.items() if f != "source_url"}
+
+
+def summary_changed(doc, summary):
+    """
+    Whether a listing summary disagrees with the stored book on any field it shows.
+    Once a summary has been checked against the detail page it is stored and
+    compared as is, so listings that never match the detail values (rounding,
+    truncated titles) do not trigger a re-fetch every cycle.
+    """
+    verified = doc.get(LISTING_FIELD)
+    if verified is not None:
+        return verified != listing_fields(summary)
+    for field, value in listing_fields(summary).items():
+        stored = doc.get(field)
+        if field == "availability":
+            stored = _listing_availability(stored)
+        if stored != value:
+            return True
+    return False
+
+def recheck_books(fetcher, writer, docs, alert_threshold_pct, extra=None):
+    """
+    Re-fetch stored books with conditional requests and apply any changes.
+    `extra`, if given, holds fields to set per book once its page was checked
+    (changed or not). Returns the change records.
+    """
+    unchanged = set()
+    records = []
+
+    def should_parse(i, page):
+        # 304 or identical body: nothing to parse or validate
+        if is_unchanged(docs[i], page):
+            unchanged.add(i)
+            if extra and extra[i]:
+                writer.update_book(docs[i]["_id"], extra[i], docs[i].get("source_url"))
+            return False
+        return True
+
+    results = fetch_and_parse(
+        fetcher,
+        [d.get("source_url") for d in docs],
+        [conditional_headers(d) for d in docs],
+        should_parse=should_parse,
+    )
+    for batch in chunked(results, FETCH_BATCH_SIZE):
+        batch = [r for r in batch if r[0] not in unchanged]
+        fingerprints = _batch_fingerprints(batch)
+        for i, page, new_doc, error in batch:
+            rec = _check_book(docs[i], page, new_doc, error, writer, alert_threshold_pct, fingerprints.get(i),
+                              extra[i] if extra else None)
+            if rec:
+                records.append(rec)
+    return records
+
+
+def _batch_fingerprints(results):
+    """{index: fingerprint} for the parsed docs in a batch of fetch_and_parse results."""
+    parsed = [(i, doc) for i, _, doc, _ in results if doc is not None]
+    return dict(zip((i for i, _ in parsed), fingerprint_many(doc for _, doc in parsed)))
+
+def insert_new_books(fetcher, writer, links, extra=None):
+    """
+    Fetch, parse and store books not yet in the database; returns their "new" change records.
+    `extra`, if given, holds fields to store with each book.
+    """
+    records = []
+    for batch in chunked(fetch_and_parse(fetcher, links), FETCH_BATCH_SIZE):
+        fingerprints = _batch_fingerprints(batch)
+        for i, page, book_data, error in batch:
+            if book_data is not None and extra:
+                book_data.update(extra[i])
+            rec = _insert_book(writer, links[i], page, book_data, error, fingerprints.get(i))
+            if rec:
+                records.append(rec)
+    return records
+
+
+def _insert_book(writer, link, page, book_data, error, content_hash):
+    """Store one fetched new book; returns its "new" change record or None."""
+    if not page.ok:
+        logger.error(f"Failed to fetch new book {link}: {page.error or page.status_code}")
+        return None
+    if error:
+        logger.error(f"Failed to parse new book {link}: {error}")
+        return None
+    try:
+        now = datetime.now(timezone.utc)
+        book_data["raw_html"] = page.text
+        book_data[VALIDATORS_FIELD] = validators_from_page(page)
+        book_data["meta"] = {"first_seen_at": now, "last_seen_at": now}
+        book_data["content_hash"] = content_hash
+        book_data[FIELD_HASHES] = field_hashes(book_data)
+
+        book_id = writer.upsert_book(book_data)
+        logger.info(f"New book stored: {link}")
+        # a new book is a delta from nothing
+        return writer.record_change(
+            book_id,
+            link,
+            "new",
+            {f: {"new": book_data.get(f)} for f in TRACKED_FIELDS},
+        )
+    except Exception as e:
+        logger.error(f"Failed to store new book {link}: {e}")
+    return None
+
+def diff_fields(old_doc, new_doc, new_hashes):
+    """
+    Tracked fields whose hash differs from the stored state, as {field: {"old", "new"}}.
+
+    Books stored before field hashes existed get a baseline from their stored
+    values; fields with neither a stored hash nor a stored value are adopted
+    instead of being reported as changed (the caller writes their value with the hash).
+    """
+    old_hashes = old_doc.get(FIELD_HASHES) or field_hashes(old_doc)
+    changed = {}
+    for f, new_h in new_hashes.items():
+        old_h = old_hashes.get(f)
+        # hashes made under another scheme (legacy sha256, other algorithm) are recomputed to compare
+        if old_h is None or old_h == new_h or field_hash_matches(old_h, new_doc.get(f)):
+            continue
+        delta = {"new": new_doc.get(f)}
+        if f in old_doc:
+            delta = {"old": old_doc.get(f), **delta}
+        changed[f] = delta
+    return changed
+
+def _check_book(old_doc, page, new_doc, parse_error, writer, alert_threshold_pct, new_fp=None, extra=None):
+    """
+    Compare a freshly fetched and parsed page with the stored state; returns a change record or None.
+    `new_fp` is the fingerprint of `new_doc` when the caller computed it in a batch;
+    `extra` fields are written along with the check.
+    """
+    source_url = old_doc.get("source_url")
+    logger.info(f"Checking {source_url}")
+    try:
+        if not page.ok:
+            raise RuntimeError(page.error or f"HTTP {page.status_code}")
+        if parse_error:
+            logger.error(f"Failed to parse {source_url}: {parse_error}")
+            return None
+
+        # new_doc is the parsed Book as a dict (parsed in the parse pool)
+        now = datetime.now(timezone.utc)
+        new_fp = new_fp or fingerprint(new_doc)
+        stored_fp = old_doc.get("content_hash")
+        # only what moved is written back
+        update = {
+            "crawl_timestamp": now,
+            "meta.last_seen_at": now,
+            VALIDATORS_FIELD: validators_from_page(page),
+            **(extra or {}),
+        }
+        # legacy fingerprints cover fewer fields, so only a current-scheme match proves nothing moved
+        if old_doc.get(FIELD_HASHES) and not is_legacy(stored_fp) and fingerprint_matches(stored_fp, new_doc):
+            # one hash over all tracked fields matches: skip the per-field diff
+            changed_fields = {}
+        else:
+            new_hashes = field_hashes(new_doc)
+            changed_fields = diff_fields(old_doc, new_doc, new_hashes)
+            if changed_fields or old_doc.get(FIELD_HASHES) != new_hashes:
+                update[FIELD_HASHES] = new_hashes
+                # a hash stored for the first time must describe the stored value, so write it too
+                stored_hashes = old_doc.get(FIELD_HASHES) or {}
+                update.update({f: new_doc.get(f) for f in new_hashes if f not in stored_hashes})
+        if stored_fp != new_fp:
+            # also upgrades legacy (unprefixed sha256) and other-algorithm fingerprints in place
+            update["content_hash"] = new_fp
+
+        rec = None
+        if changed_fields:
+            update.update({f: new_doc.get(f) for f in changed_fields})
+            update["raw_html"] = page.text
+            rec = writer.record_change(old_doc["_id"], source_url, "update", changed_fields)
+            _alert(source_url, changed_fields, alert_threshold_pct)
+        writer.update_book(old_doc["_id"], update, source_url)
+        return rec
+    except Exception as e:
+        logger.error(f"Error fetching {source_url}: {e}")
+    return None
+
+def _alert(source_url, changed_fields, alert_threshold_pct):
+    """Log price drops past the threshold and availability toggles."""
+    try:
+        price = changed_fields.get("price_including_tax", {})
+        old_price = price.get("old") or 0.0
+        new_price = price.get("new") or 0.0
+        if old_price and new_price:
+            pct = (old_price - new_price) / old_price * 100
+            if pct >= alert_threshold_pct:
+                logger.warning(f"PRICE DROP ALERT: {source_url} dropped {pct:.2f}% from {old_price} to {new_price}")
+        if "availability" in changed_fields:
+            avail = changed_fields["availability"]
+            logger.warning(f"AVAILABILITY CHANGED: {source_url}: '{avail.get('old')}' -> '{avail.get('new')}'")
+    except Exception as e:
+        logger.error(f"Error computing alerts for {source_url}: {e}")
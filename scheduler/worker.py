@@ -1,131 +1,46 @@
 import argparse
 import os
-import time
-from datetime import datetime, timezone
-from urllib.parse import urljoin
 
 from apscheduler.schedulers.blocking import BlockingScheduler
-from bs4 import BeautifulSoup
 
-from crawler.scraper import init_driver 
-from crawler.parser import parse_book_page
-from crawler.storage import (
-    get_book_by_source_url,
-    upsert_book_doc,
-    record_change,
-)
-from scheduler.change_detector import detect_changes
+from crawler.fetcher import get_fetcher
+from crawler.storage import BulkWriter, bump_generation, ensure_indexes, refresh_stats
+from scheduler.change_detector import full_pass_due, sync_catalogue
 from utils.logger import get_logger
 from utils.reports import write_reports
-from utils.hash_utils import fingerprint_book
 from utils.email_alerts import EmailAlerter
 
 logger = get_logger()
 
-BASE_URL = os.getenv("BASE_URL", "https://books.toscrape.com")
+# "listing": compare catalogue listing summaries and open only new/changed books,
+# with a full pass every FULL_PASS_INTERVAL_DAYS; "full": re-fetch (conditionally)
+# every listed book on every cycle
+DETECTION_MODE = os.getenv("DETECTION_MODE", "listing")
 
 
-def discover_new_books(driver):
-    """Crawl index pages for new book links and insert any missing books."""
-    page_num = 1
-    new_count = 0
-
-    while True:
-        page_url = BASE_URL if page_num == 1 else f"{BASE_URL}/catalogue/page-{page_num}.html"
-        logger.info(f"Discovering page: {page_url}")
-        driver.get(page_url)
-        time.sleep(0.6)
-
-        soup = BeautifulSoup(driver.page_source, "lxml")
-        anchors = soup.select("h3 a")
-        if not anchors:
-            break  # No more pages
-
-        for a in anchors:
-            href = a.get("href")
-            link = urljoin(page_url, href)
-
-            # Skip if already in DB
-            if get_book_by_source_url(link):
-                continue
-
-            logger.info(f"New book found: {link}")
-            try:
-                driver.get(link)
-                time.sleep(0.5)
-                html = driver.page_source
-
-                # Parse book details
-                book = parse_book_page(html, link)
-                book_data = book.model_dump()
-                book_data["raw_html"] = html
-                book_data["meta"] = {
-                    "first_seen_at": datetime.now(timezone.utc),
-                    "last_seen_at": datetime.now(timezone.utc),
-                }
-                book_data["content_hash"] = fingerprint_book(book_data)
-
-                # Upsert into DB
-                res = upsert_book_doc(book_data)
-
-                # Record change log
-                record_change(
-                    res["_id"],
-                    link,
-                    "new",
-                    {"created": True},
-                    None,
-                    book_data,
-                )
-                new_count += 1
-
-            except Exception as e:
-                logger.error(f"Failed to parse during discovery {link}: {e}")
-                continue
-
-        page_num += 1
-
-    return new_count
-
-
-def run_cycle_old():
-    """Perform one full crawl + change detection cycle."""
-    logger.info("Starting discovery and change-detection cycle...")
-
-    driver = init_driver()
-    try:
-        new_count = discover_new_books(driver)
-        logger.info(f"Discovery complete — {new_count} new books added.")
-    finally:
-        driver.quit()
-
-    # Run change detection
-    changes = detect_changes(run_headless=True)
-    logger.info(f"Change detection complete — {len(changes)} updates found.")
-
-    # Generate daily report
-    report_path = write_reports(changes)
-    logger.info(f"Report generated at: {report_path}")
-
 def run_cycle():
     """Perform one full crawl + change detection cycle."""
     logger.info("Starting discovery and change-detection cycle...")
     alerter = EmailAlerter()
 
-    driver = init_driver()
-    try:
-        new_count = discover_new_books(driver)
+    with get_fetcher(headless=True) as fetcher, BulkWriter() as writer:
+        # one walk over the listing pages finds new, changed and removed books
+        full = DETECTION_MODE == "full" or full_pass_due()
+        if full:
+            logger.info("Running a full pass: every listed book is re-fetched")
+        records = sync_catalogue(fetcher=fetcher, writer=writer, full=full)
+        new_count = sum(1 for r in records if r["change_type"] == "new")
+        changes = [r for r in records if r["change_type"] != "new"]
         if new_count > 0:
             alerter.send_alert(
                 f"[Books Crawler] {new_count} New Books Found",
                 [{"type": "discovery", "changes": {"new_books": new_count}}]
             )
         logger.info(f"Discovery complete — {new_count} new books added.")
-    finally:
-        driver.quit()
+    # everything is flushed now; rebuild /stats and let API caches pick up the new data
+    refresh_stats()
+    bump_generation()
 
-    # Run change detection
-    changes = detect_changes(run_headless=True)
     if changes:
         alerter.send_alert(
             f"[Books Crawler] {len(changes)} Changes Detected",
@@ -140,6 +55,7 @@ def run_cycle():
 
 def main(run_once=False):
     """Run the scheduler loop (daily at 03:00) or immediately once."""
+    ensure_indexes()
     if run_once:
         run_cycle()
         return
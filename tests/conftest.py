@@ -5,6 +5,7 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from fastapi_limiter import FastAPILimiter
 import importlib
+import mongomock
 
 try:
     from api.security import auth
@@ -29,6 +30,100 @@ def chrome_driver():
     driver.quit()
 
 
+@pytest.fixture(autouse=True)
+def blob_store_dir(tmp_path, monkeypatch):
+    """Keep raw HTML written during tests out of the working directory."""
+    path = tmp_path / "html_store"
+    monkeypatch.setattr("crawler.blob_store.BLOB_STORE_DIR", str(path))
+    return path
+
+
+class AsyncCursor:
+    """Async facade over a mongomock cursor, shaped like pymongo's AsyncCursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, n):
+        self._cursor = self._cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+
+class AsyncCollection:
+    """Async facade over a mongomock collection; the sync API stays reachable via `.sync`."""
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self.sync.find_one(*args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return self.sync.count_documents(*args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return self.sync.insert_one(*args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return self.sync.update_one(*args, **kwargs)
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.sync = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.sync[name])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+@pytest.fixture
+def mongo_db():
+    """
+    mongomock database wired into the API in place of the async Mongo client.
+    Returns the sync handle so tests can seed data directly.
+    """
+    from api.main import app
+    from api.deps import get_db
+    from api.cache import response_cache
+
+    database = mongomock.MongoClient()["test_db"]
+    app.dependency_overrides[get_db] = lambda: AsyncDatabase(database)
+    response_cache.reset()
+    yield database
+    app.dependency_overrides.pop(get_db, None)
+    response_cache.reset()
+
+
 @pytest.fixture
 def sample_book_html():
     """Provides sample book HTML for testing parsers"""
@@ -108,4 +203,8 @@ def mock_api_key(monkeypatch, request):
     def fake_get_api_key():
         return "test-key"
 
+    # routes captured the real dependency at import time, so override it on the app too
+    from api.main import app
+    monkeypatch.setitem(app.dependency_overrides, auth.get_api_key, fake_get_api_key)
+
     monkeypatch.setattr(auth, "get_api_key", fake_get_api_key)
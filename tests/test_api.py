@@ -13,22 +13,337 @@ def mock_rate_limiter(monkeypatch):
     monkeypatch.setattr(FastAPILimiter, "init", fake_init)
     monkeypatch.setattr("api.main.RateLimiter", lambda *a, **k: None)
 
+@pytest.mark.no_auth
 def test_list_books_unauthorized():
     client = TestClient(app)
     resp = client.get("/books")
     assert resp.status_code == 401
 
 
-def test_list_books_authorized(monkeypatch):
+def test_list_books_authorized(mongo_db):
     client = TestClient(app)
 
-    # Mock DB functions
-    mock_books = [{"_id": "1", "name": "Mock Book", "price_including_tax": 20.0}]
-    monkeypatch.setattr("api.routers.books.db.books.find", lambda *a, **k: mock_books)
-    monkeypatch.setattr("api.routers.books.db.books.count_documents", lambda *a, **k: 1)
+    mongo_db.books.insert_one({"name": "Mock Book", "price_including_tax": 20.0})
 
     headers = {"X-API-Key": "your-secret-key-here"}
     resp = client.get("/books", headers=headers)
     assert resp.status_code == 200
     data = resp.json()
     assert "books" in data
+    assert data["total"] == 1
+
+
+def test_list_books_cursor_pagination(mongo_db):
+    client = TestClient(app)
+    mongo_db.books.insert_many([
+        {"name": f"Book {i}", "rating": i % 3 + 1, "price_including_tax": float(i)}
+        for i in range(7)
+    ])
+
+    seen, cursor = [], None
+    while True:
+        params = {"sort_by": "rating", "page_size": 3, "include_total": False}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/books/", params=params).json()
+        seen += [(b["rating"], b["_id"]) for b in data["books"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 7
+    assert seen == sorted(seen)
+    assert data["total"] is None
+
+
+def test_list_books_invalid_cursor(mongo_db):
+    client = TestClient(app)
+    resp = client.get("/books/", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+
+
+def test_books_are_lean_by_default(mongo_db):
+    client = TestClient(app)
+    book_id = mongo_db.books.insert_one({
+        "name": "Heavy Book",
+        "description": "long text",
+        "raw_html": "<html>...</html>",
+        "meta": {"first_seen_at": "2025-11-08T00:00:00"},
+        "rating": 4,
+    }).inserted_id
+
+    listed = client.get("/books/").json()["books"][0]
+    assert listed["_id"] == str(book_id)
+    assert listed["name"] == "Heavy Book"
+    assert "raw_html" not in listed and "description" not in listed and "meta" not in listed
+
+    detail = client.get(f"/books/{book_id}").json()
+    assert detail["description"] == "long text"
+    assert "raw_html" not in detail
+
+
+def test_books_fields_parameter(mongo_db):
+    client = TestClient(app)
+    mongo_db.books.insert_one({"name": "Book", "rating": 4, "category": "Poetry"})
+
+    data = client.get("/books/", params={"fields": "name", "sort_by": "rating"}).json()
+    assert data["books"] == [{"_id": data["books"][0]["_id"], "name": "Book"}]
+
+    assert client.get("/books/", params={"fields": "name,raw_html"}).status_code == 400
+
+
+def test_list_books_served_from_cache_until_generation_bump(mongo_db, monkeypatch):
+    from api.cache import GENERATION_KEY, response_cache
+
+    client = TestClient(app)
+    monkeypatch.setattr(response_cache, "poll_interval", 0)
+    mongo_db.books.insert_one({"name": "First"})
+    assert client.get("/books/").json()["total"] == 1
+
+    mongo_db.books.insert_one({"name": "Second"})
+    assert client.get("/books/").json()["total"] == 1
+
+    mongo_db.crawler_state.insert_one({"key": GENERATION_KEY, "value": 1})
+    assert client.get("/books/").json()["total"] == 2
+
+
+def test_list_books_rejects_bad_page_size_and_foreign_cursor(mongo_db):
+    client = TestClient(app)
+    mongo_db.books.insert_many([{"name": f"Book {i}", "rating": i, "num_reviews": i} for i in range(3)])
+
+    assert client.get("/books/", params={"page_size": 0}).status_code == 422
+    cursor = client.get("/books/", params={"sort_by": "rating", "page_size": 1}).json()["next_cursor"]
+    resp = client.get("/books/", params={"sort_by": "num_reviews", "cursor": cursor})
+    assert resp.status_code == 400
+    assert client.get("/books/", params={"cursor": cursor}).status_code == 400
+
+
+def test_fields_with_only_id_returns_only_id(mongo_db):
+    client = TestClient(app)
+    book_id = mongo_db.books.insert_one({"name": "Lean", "content_hash": "abc", "meta": {}}).inserted_id
+
+    for fields in ("_id", ","):
+        assert client.get(f"/books/{book_id}", params={"fields": fields}).json() == {"_id": str(book_id)}
+    assert client.get("/books/", params={"fields": "_id"}).json()["books"] == [{"_id": str(book_id)}]
+
+
+def test_get_book_etag_and_not_modified(mongo_db):
+    client = TestClient(app)
+    book_id = mongo_db.books.insert_one({"name": "Tagged", "content_hash": "abc"}).inserted_id
+
+    resp = client.get(f"/books/{book_id}", params={"fields": "name"})
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+    assert "content_hash" not in resp.json()
+    assert "must-revalidate" in resp.headers["Cache-Control"]
+
+    resp = client.get(f"/books/{book_id}", params={"fields": "name"}, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert resp.content == b""
+
+    # a different representation of the same book gets its own tag
+    other = client.get(f"/books/{book_id}", params={"fields": "name,rating"})
+    assert other.headers["ETag"] != etag
+
+
+def test_removed_books_leave_the_catalogue(mongo_db):
+    from datetime import datetime, timezone
+
+    client = TestClient(app)
+    mongo_db.books.insert_one({"name": "Listed"})
+    gone_id = mongo_db.books.insert_one({"name": "Gone", "meta": {"removed_at": datetime.now(timezone.utc)}}).inserted_id
+
+    assert [b["name"] for b in client.get("/books/").json()["books"]] == ["Listed"]
+    assert client.get("/books/export").text.count("\n") == 1
+    assert client.get(f"/books/{gone_id}").status_code == 200
+
+
+def test_get_book_etag_changes_when_book_is_removed(mongo_db, monkeypatch):
+    from datetime import datetime, timezone
+    from api.cache import GENERATION_KEY, response_cache
+
+    client = TestClient(app)
+    monkeypatch.setattr(response_cache, "poll_interval", 0)
+    book_id = mongo_db.books.insert_one({"name": "Gone", "content_hash": "abc", "meta": {}}).inserted_id
+    etag = client.get(f"/books/{book_id}").headers["ETag"]
+
+    # same tracked content, but meta moved
+    mongo_db.books.update_one({"_id": book_id}, {"$set": {"meta.removed_at": datetime.now(timezone.utc)}})
+    mongo_db.crawler_state.insert_one({"key": GENERATION_KEY, "value": 1})
+    resp = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json()["meta"]["removed_at"]
+
+
+def test_list_books_etag_follows_generation(mongo_db, monkeypatch):
+    from api.cache import GENERATION_KEY, response_cache
+
+    client = TestClient(app)
+    monkeypatch.setattr(response_cache, "poll_interval", 0)
+    mongo_db.books.insert_one({"name": "First"})
+
+    etag = client.get("/books/").headers["ETag"]
+    assert client.get("/books/", headers={"If-None-Match": etag}).status_code == 304
+
+    mongo_db.crawler_state.insert_one({"key": GENERATION_KEY, "value": 1})
+    resp = client.get("/books/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_export_books_ndjson_and_csv(mongo_db):
+    import csv
+    import io
+    import json
+
+    client = TestClient(app)
+    mongo_db.books.insert_many([
+        {"name": f"Book {i}", "category": "Poetry" if i % 2 else "Travel", "rating": i, "meta": {"n": i}}
+        for i in range(1, 6)
+    ])
+
+    resp = client.get("/books/export", params={"category": "Poetry", "fields": "name,rating"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["name"] for r in rows] == ["Book 1", "Book 3", "Book 5"]
+    assert set(rows[0]) == {"_id", "name", "rating"}
+
+    resp = client.get("/books/export", params={"format": "csv", "fields": "name,meta", "gzip": True})
+    assert resp.headers["content-encoding"] == "gzip"
+    rows = list(csv.reader(io.StringIO(resp.text)))  # httpx decodes the gzip body
+    assert rows[0] == ["_id", "name", "meta"]
+    assert len(rows) == 6
+    assert json.loads(rows[1][2]) == {"n": 1}
+
+
+def _seed_changes(db):
+    from datetime import datetime, timedelta, timezone
+    from bson import ObjectId
+
+    start = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    ids = sorted(ObjectId() for _ in range(4))
+    db.changes.insert_many([
+        {
+            "_id": ids[i],
+            "book_id": ObjectId(),
+            "source_url": f"https://example.com/{i % 2}",
+            "change_type": "new" if i == 0 else "update",
+            "changed_fields": {"price_including_tax": {"old": i, "new": i + 1}},
+            "old_snapshot": {"name": "big"},
+            "new_snapshot": {"name": "big"},
+            "detected_at": start + timedelta(hours=i),
+        }
+        for i in range(4)
+    ])
+    return [str(i) for i in ids]
+
+
+def test_changes_feed_reads_changes_collection(mongo_db):
+    client = TestClient(app)
+    ids = _seed_changes(mongo_db)
+
+    data = client.get("/changes/", params={"limit": 2}).json()
+    assert [c["_id"] for c in data["changes"]] == [ids[3], ids[2]]
+    assert data["next_since"] == ids[3]
+    assert "old_snapshot" not in data["changes"][0]
+
+    data = client.get("/changes/", params={"since": ids[0], "change_type": "update"}).json()
+    assert [c["_id"] for c in data["changes"]] == ids[1:]
+
+    data = client.get("/changes/", params={"since": "2025-11-01T01:30:00Z", "source_url": "https://example.com/1"}).json()
+    assert [c["_id"] for c in data["changes"]] == [ids[3]]
+
+    assert client.get("/changes/", params={"since": "yesterday"}).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_change_events_stream_after_cursor(mongo_db):
+    from bson import ObjectId
+    from api.routers.changes import change_events
+    from tests.conftest import AsyncDatabase
+
+    ids = _seed_changes(mongo_db)
+    events = change_events(AsyncDatabase(mongo_db), {"change_type": "update"}, ObjectId(ids[1]), poll_interval=0)
+    first = await anext(events)
+    second = await anext(events)
+    await events.aclose()
+
+    assert first.startswith(f"id: {ids[2]}\nevent: change\ndata: ")
+    assert second.startswith(f"id: {ids[3]}\n")
+
+
+def test_stats_served_from_materialized_doc(mongo_db):
+    from datetime import datetime, timezone
+
+    client = TestClient(app)
+    assert client.get("/stats/").status_code == 404
+
+    mongo_db.stats.insert_one({
+        "_id": "catalogue",
+        "total_books": 2,
+        "categories": [{"category": "Poetry", "count": 2, "avg_price": 15.0}],
+        "ratings": [{"rating": 3, "count": 2}],
+        "price_buckets": [{"min": 0, "max": 20, "count": 2}, {"min": 20, "max": None, "count": 0}],
+        "price": {"min": 12.0, "max": 18.0, "avg": 15.0},
+        "computed_at": datetime(2025, 11, 1, tzinfo=timezone.utc),
+    })
+    data = client.get("/stats/").json()
+    assert data["total_books"] == 2
+    assert data["categories"][0]["category"] == "Poetry"
+    assert data["price_buckets"][1]["max"] is None
+
+
+def test_search_books_ranks_by_text_score(mongo_db, monkeypatch):
+    """mongomock has no $text, so check the query the endpoint sends and the shape it returns."""
+    from bson import ObjectId
+    from api.deps import get_db
+    from tests.conftest import AsyncDatabase
+
+    calls = {}
+
+    class TextCursor:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def sort(self, spec):
+            calls["sort"] = spec
+            return self
+
+        def skip(self, n):
+            calls["skip"] = n
+            return self
+
+        def limit(self, n):
+            return self
+
+        async def to_list(self, length=None):
+            return self.docs
+
+    class TextSearchBooks:
+        def find(self, query, projection):
+            calls["query"], calls["projection"] = query, projection
+            return TextCursor([{"_id": ObjectId(), "name": "The Secret Garden", "score": 1.5}])
+
+        async def count_documents(self, query):
+            return 1
+
+    class SearchDatabase(AsyncDatabase):
+        books = TextSearchBooks()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: SearchDatabase(mongo_db))
+    client = TestClient(app)
+
+    resp = client.get("/books/search", params={"q": "secret garden", "category": "Classics", "fields": "name", "page": 2})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total"] == 1
+    assert data["books"][0]["name"] == "The Secret Garden"
+    assert data["books"][0]["score"] == 1.5
+    assert calls["query"] == {"$text": {"$search": "secret garden"}, "meta.removed_at": None, "category": "Classics"}
+    assert calls["projection"] == {"name": 1, "score": {"$meta": "textScore"}}
+    assert calls["sort"] == [("score", {"$meta": "textScore"}), ("_id", 1)]
+    assert calls["skip"] == 10
+
+    assert client.get("/books/search").status_code == 422
@@ -0,0 +1,20 @@
+import gzip
+from crawler.blob_store import get_html, put_html
+
+
+def test_put_and_get_round_trip(blob_store_dir):
+    digest = put_html("<html>£51.77</html>")
+    assert get_html(digest) == "<html>£51.77</html>"
+
+    stored = list(blob_store_dir.rglob("*.html.gz"))
+    assert len(stored) == 1
+    assert gzip.decompress(stored[0].read_bytes()).decode("utf-8") == "<html>£51.77</html>"
+
+
+def test_identical_pages_are_deduplicated(blob_store_dir):
+    assert put_html("<html>same</html>") == put_html("<html>same</html>")
+    assert len(list(blob_store_dir.rglob("*.html.gz"))) == 1
+
+
+def test_missing_blob():
+    assert get_html("0" * 64) is None
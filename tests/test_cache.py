@@ -0,0 +1,72 @@
+import mongomock
+import pytest
+
+from api.cache import GENERATION_KEY, ResponseCache, cache_key
+from tests.conftest import AsyncDatabase
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def state_db():
+    return mongomock.MongoClient()["test_db"]
+
+
+def test_cache_key_ignores_order_and_unset_params():
+    a = cache_key("books.list", rating=3, category=None, fields=["name", "rating"])
+    b = cache_key("books.list", fields=["rating", "name"], rating=3)
+    assert a == b
+    assert a != cache_key("books.list", rating=4, fields=["name", "rating"])
+
+
+def test_lru_eviction_and_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    clock.now = 11
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_generation_bump_drops_entries_after_poll(state_db):
+    clock = FakeClock()
+    cache = ResponseCache(poll_interval=5, clock=clock)
+    db = AsyncDatabase(state_db)
+
+    assert await cache.lookup(db, "k") == (0, None)
+    cache.set("k", "v", 0)
+    assert await cache.lookup(db, "k") == (0, "v")
+
+    state_db.crawler_state.insert_one({"key": GENERATION_KEY, "value": 1})
+    # still inside the poll interval: the bump is not seen yet
+    assert await cache.lookup(db, "k") == (0, "v")
+
+    clock.now = 6
+    assert await cache.lookup(db, "k") == (1, None)
+    assert cache.generation == 1
+
+
+@pytest.mark.asyncio
+async def test_set_drops_values_built_before_a_generation_bump(state_db):
+    clock = FakeClock()
+    cache = ResponseCache(poll_interval=0, clock=clock)
+    db = AsyncDatabase(state_db)
+
+    generation, _ = await cache.lookup(db, "k")
+    # another request sees the bump while this one is still querying
+    state_db.crawler_state.insert_one({"key": GENERATION_KEY, "value": 1})
+    await cache.lookup(db, "other")
+    cache.set("k", "stale", generation)
+    assert await cache.lookup(db, "k") == (1, None)
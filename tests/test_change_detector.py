@@ -0,0 +1,199 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from crawler.fetcher import Page
+from scheduler import change_detector
+from scheduler.change_detector import (
+    LISTING_FIELD, _check_book, _record_removed, diff_fields, recheck_books, summary_changed,
+)
+from utils.fingerprint import field_hashes, fingerprint
+from utils.hash_utils import FIELD_HASHES, field_hash, fingerprint_book
+
+
+class FakeWriter:
+    def __init__(self):
+        self.updates = []
+        self.changes = []
+
+    def update_book(self, book_id, fields, source_url=None):
+        self.updates.append((book_id, fields))
+
+    def record_change(self, book_id, source_url, change_type, changed_fields):
+        rec = {"book_id": book_id, "change_type": change_type, "changed_fields": changed_fields}
+        self.changes.append(rec)
+        return rec
+
+    def flush(self):
+        pass
+
+
+def parsed(**overrides):
+    doc = {
+        "source_url": "https://example.com/b", "name": "B", "description": "Long text",
+        "category": "Poetry", "price_including_tax": 20.0, "price_excluding_tax": 20.0,
+        "availability": "In stock", "num_reviews": 0, "rating": 3, "image_url": "https://example.com/b.jpg",
+    }
+    return {**doc, **overrides}
+
+
+def stored(doc):
+    """What detection reads back: the projected state, without the description value."""
+    state = {k: v for k, v in doc.items() if k != "description"}
+    return {**state, "_id": ObjectId(), FIELD_HASHES: field_hashes(doc), "content_hash": fingerprint(doc)}
+
+
+def test_diff_fields_baselines_legacy_docs_from_stored_values():
+    legacy = {k: v for k, v in parsed().items() if k != "description"}  # no hashes, no description
+    new = parsed(price_including_tax=18.0, description="Rewritten")
+    changed = diff_fields(legacy, new, field_hashes(new))
+    assert changed == {"price_including_tax": {"old": 20.0, "new": 18.0}}
+
+
+def test_diff_fields_reports_hash_only_fields_without_old_value():
+    old = stored(parsed())
+    new = parsed(description="Rewritten")
+    assert diff_fields(old, new, field_hashes(new)) == {"description": {"new": "Rewritten"}}
+
+
+
+def test_diff_fields_compares_legacy_field_hashes():
+    old = stored(parsed())
+    old[FIELD_HASHES] = {f: field_hash(old.get(f)) for f in old[FIELD_HASHES]}
+    old[FIELD_HASHES]["description"] = field_hash("Long text")
+    new = parsed(price_including_tax=18.0)
+    assert diff_fields(old, new, field_hashes(new)) == {"price_including_tax": {"old": 20.0, "new": 18.0}}
+def test_check_book_unchanged_writes_only_crawl_metadata():
+    old = stored(parsed())
+    writer = FakeWriter()
+    page = Page(url=old["source_url"], status_code=200, text="<html>same</html>")
+
+    assert _check_book(old, page, parsed(), None, writer, 5) is None
+    assert writer.changes == []
+    (book_id, update), = writer.updates
+    assert book_id == old["_id"]
+    assert set(update) == {"crawl_timestamp", "meta.last_seen_at", "http_validators"}
+
+
+def test_check_book_changed_writes_delta_and_delta_record():
+    old = stored(parsed())
+    writer = FakeWriter()
+    page = Page(url=old["source_url"], status_code=200, text="<html>new</html>")
+
+    rec = _check_book(old, page, parsed(availability="Out of stock"), None, writer, 5)
+
+    assert rec["changed_fields"] == {"availability": {"old": "In stock", "new": "Out of stock"}}
+    (_, update), = writer.updates
+    assert update["availability"] == "Out of stock"
+    assert "price_including_tax" not in update and "name" not in update
+    assert update[FIELD_HASHES]["availability"] != old[FIELD_HASHES]["availability"]
+    assert update["content_hash"] == fingerprint(parsed(availability="Out of stock"))
+    assert update["raw_html"] == "<html>new</html>"
+
+
+def test_check_book_upgrades_legacy_fingerprint_without_reporting_a_change():
+    old = {**stored(parsed()), "content_hash": fingerprint_book(parsed())}
+    writer = FakeWriter()
+    page = Page(url=old["source_url"], status_code=200, text="<html>same</html>")
+
+    assert _check_book(old, page, parsed(), None, writer, 5) is None
+    (_, update), = writer.updates
+    assert update["content_hash"] == fingerprint(parsed())
+    assert FIELD_HASHES not in update
+
+
+def test_check_book_matches_fingerprints_across_algorithms():
+    old = stored(parsed())  # content_hash made with blake2b
+    writer = FakeWriter()
+    page = Page(url=old["source_url"], status_code=200, text="<html>same</html>")
+
+    # the batch was fingerprinted under another algorithm
+    assert _check_book(old, page, parsed(), None, writer, 5, "xx:0123") is None
+    (_, update), = writer.updates
+    assert FIELD_HASHES not in update
+    assert update["content_hash"] == "xx:0123"
+
+
+def test_check_book_writes_values_of_adopted_fields():
+    legacy = {**stored(parsed()), "content_hash": fingerprint_book(parsed())}
+    del legacy[FIELD_HASHES]
+    writer = FakeWriter()
+    page = Page(url=legacy["source_url"], status_code=200, text="<html>same</html>")
+
+    assert _check_book(legacy, page, parsed(description="Current text"), None, writer, 5) is None
+    (_, update), = writer.updates
+    assert update[FIELD_HASHES]["description"] == field_hashes(parsed(description="Current text"))["description"]
+    assert update["description"] == "Current text"
+
+
+def test_summary_changed_compares_only_listing_fields():
+    doc = stored(parsed(availability="In stock (22 available)"))
+    summary = {"source_url": doc["source_url"], "name": "B", "price_including_tax": 20.0,
+               "availability": "In stock", "rating": 3}
+
+    assert not summary_changed(doc, summary)
+    # fields the listing does not show are not compared
+    assert not summary_changed(doc, {"source_url": doc["source_url"], "price_including_tax": 20.0})
+    assert summary_changed(doc, {**summary, "price_including_tax": 18.5})
+    assert summary_changed(doc, {**summary, "availability": "Out of stock"})
+
+
+
+def test_recheck_remembers_listing_of_unchanged_page(monkeypatch):
+    doc = stored(parsed(name="A Very Long Title"))
+    summary = {"source_url": doc["source_url"], "name": "A Very Long..."}  # listings truncate titles
+    assert summary_changed(doc, summary)
+
+    def fake_fetch_and_parse(fetcher, urls, headers, should_parse):
+        page = Page(url=urls[0], status_code=304)
+        assert not should_parse(0, page)
+        yield 0, page, None, None
+
+    monkeypatch.setattr(change_detector, "fetch_and_parse", fake_fetch_and_parse)
+    writer = FakeWriter()
+    listing = {"name": "A Very Long..."}
+    assert recheck_books(None, writer, [doc], 20, [{LISTING_FIELD: listing}]) == []
+
+    assert writer.updates == [(doc["_id"], {LISTING_FIELD: listing})]
+    assert not summary_changed({**doc, LISTING_FIELD: listing}, summary)
+    assert summary_changed({**doc, LISTING_FIELD: listing}, {**summary, "name": "Another..."})
+def test_record_removed_marks_books_not_listed_since_walk_start(monkeypatch):
+    started_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    calls = []
+    monkeypatch.setattr(change_detector, "get_unseen_books", lambda since: calls.append(since) or {"https://example.com/0": 0})
+    monkeypatch.setattr(change_detector, "count_active_books", lambda: 10)
+    writer = FakeWriter()
+
+    records = _record_removed(writer, started_at)
+
+    assert calls == [started_at]
+    assert [r["change_type"] for r in records] == ["removed"]
+    assert records[0]["book_id"] == 0
+    assert writer.updates[0][0] == 0
+    assert writer.updates[0][1]["meta.removed_at"] is not None
+
+
+def test_record_removed_skips_when_too_many_missing(monkeypatch):
+    missing = {f"https://example.com/{i}": i for i in range(5)}
+    monkeypatch.setattr(change_detector, "get_unseen_books", lambda since: missing)
+    monkeypatch.setattr(change_detector, "count_active_books", lambda: 10)
+    writer = FakeWriter()
+
+    assert _record_removed(writer, datetime.now(timezone.utc)) == []
+    assert writer.updates == [] and writer.changes == []
+
+
+def test_full_pass_due_after_interval(monkeypatch):
+    state = {}
+    monkeypatch.setattr(change_detector, "get_state", lambda key, default=None: state.get(key, default))
+    monkeypatch.setattr(change_detector, "FULL_PASS_INTERVAL_DAYS", 7)
+    now = datetime(2025, 1, 10, tzinfo=timezone.utc)
+
+    assert change_detector.full_pass_due(now)  # never ran
+    state[change_detector.FULL_PASS_KEY] = datetime(2025, 1, 5)  # naive, as read back from Mongo
+    assert not change_detector.full_pass_due(now)
+    state[change_detector.FULL_PASS_KEY] = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    assert change_detector.full_pass_due(now)
+
+    monkeypatch.setattr(change_detector, "FULL_PASS_INTERVAL_DAYS", 0)
+    assert not change_detector.full_pass_due(now)
@@ -0,0 +1,89 @@
+from crawler.driver_pool import DriverPool
+
+
+class FakeDriver:
+    instances = []
+
+    def __init__(self):
+        self.current_url = None
+        self.page_source = ""
+        self.alive = True
+        self.quit_called = False
+        FakeDriver.instances.append(self)
+
+    def get(self, url):
+        self.current_url = url
+        self.page_source = f"<html>{url}</html>"
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("session deleted")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+def make_pool(**kwargs):
+    FakeDriver.instances = []
+    return DriverPool(driver_factory=FakeDriver, **kwargs)
+
+
+def test_pool_renders_in_order():
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    with make_pool(size=3) as pool:
+        pages = pool.fetch_all(urls)
+    assert [p.url for p in pages] == urls
+    assert all(p.ok for p in pages)
+    assert all(d.quit_called for d in FakeDriver.instances)
+
+
+def test_pool_recycles_after_max_pages():
+    with make_pool(size=1, max_pages=2) as pool:
+        pool.fetch_all([f"https://example.com/{i}" for i in range(5)])
+        assert len(FakeDriver.instances) == 3
+        assert FakeDriver.instances[0].quit_called
+
+
+def test_pool_replaces_unhealthy_driver():
+    with make_pool(size=1) as pool:
+        FakeDriver.instances[0].alive = False
+        page = pool.fetch("https://example.com/")
+        assert page.ok
+        assert len(FakeDriver.instances) == 2
+        assert FakeDriver.instances[0].quit_called
+
+
+def test_pool_keeps_driver_when_replacement_fails():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("chrome failed to start")
+        return FakeDriver()
+
+    FakeDriver.instances = []
+    with DriverPool(driver_factory=factory, size=1) as pool:
+        FakeDriver.instances[0].alive = False
+        page = pool.fetch("https://example.com/a")
+        assert not page.ok and "No healthy driver" in page.error
+        assert pool._idle.qsize() == 1
+
+        FakeDriver.instances[0].alive = True
+        assert pool.fetch("https://example.com/b").ok
+
+
+def test_failed_checkout_returns_rate_limit_slot():
+    def factory():
+        if len(FakeDriver.instances) >= 2:
+            raise RuntimeError("chrome failed to start")
+        return FakeDriver()
+
+    FakeDriver.instances = []
+    with DriverPool(driver_factory=factory, size=2) as pool:
+        for d in FakeDriver.instances:
+            d.alive = False
+        pages = [pool.fetch("https://example.com/") for _ in range(3)]
+        assert not any(p.ok for p in pages)
+        assert pool.rate_limiter.for_url("https://example.com/").in_flight == 0
@@ -0,0 +1,103 @@
+import time
+
+import httpx
+from crawler.fetcher import HttpFetcher, chunked
+from crawler.rate_limit import RateLimiter
+
+
+def unthrottled():
+    return RateLimiter(rate=1000, burst=1000, max_rate=1000)
+
+
+def make_transport(pages):
+    def handler(request):
+        body = pages.get(str(request.url))
+        if body is None:
+            return httpx.Response(404, text="Page not found")
+        return httpx.Response(200, text=body)
+    return httpx.MockTransport(handler)
+
+
+def test_fetch_all_keeps_order():
+    pages = {f"https://example.com/{i}": f"<p>{i}</p>" for i in range(25)}
+    with HttpFetcher(concurrency=5, transport=make_transport(pages), rate_limiter=unthrottled()) as fetcher:
+        results = fetcher.fetch_all(list(pages))
+
+    assert [r.text for r in results] == list(pages.values())
+    assert all(r.ok for r in results)
+
+
+def test_fetch_reports_status_and_errors():
+    def handler(request):
+        if request.url.path == "/boom":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(404, text="Page not found")
+
+    with HttpFetcher(transport=httpx.MockTransport(handler)) as fetcher:
+        missing, broken = fetcher.fetch_all(["https://example.com/missing", "https://example.com/boom"])
+
+    assert missing.status_code == 404 and not missing.ok
+    assert broken.error and not broken.ok
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_fetch_all_sends_per_url_headers():
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="fresh")
+
+    with HttpFetcher(transport=httpx.MockTransport(handler)) as fetcher:
+        cached, fresh = fetcher.fetch_all(
+            ["https://example.com/a", "https://example.com/b"],
+            [{"If-None-Match": '"v1"'}, None],
+        )
+
+    assert cached.status_code == 304
+    assert fresh.text == "fresh"
+
+
+def test_iter_fetch_yields_every_page_once():
+    pages = {f"https://example.com/{i}": f"<p>{i}</p>" for i in range(30)}
+    urls = list(pages)
+    with HttpFetcher(concurrency=4, transport=make_transport(pages), rate_limiter=unthrottled()) as fetcher:
+        results = dict(fetcher.iter_fetch(urls, buffer=3))
+
+    assert sorted(results) == list(range(30))
+    assert all(results[i].text == pages[urls[i]] for i in results)
+
+
+def test_fetch_retries_throttled_response():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, text="ok")
+
+    with HttpFetcher(transport=httpx.MockTransport(handler)) as fetcher:
+        page = fetcher.fetch("https://example.com/a")
+        host = fetcher.rate_limiter.for_url("https://example.com/a")
+    assert page.ok and page.text == "ok"
+    assert len(calls) == 2
+    assert host.in_flight == 0
+
+
+def test_abandoned_iter_fetch_returns_rate_limit_slots():
+    def handler(request):
+        time.sleep(0.05)
+        return httpx.Response(200, text="ok")
+
+    urls = [f"https://example.com/{i}" for i in range(20)]
+    with HttpFetcher(concurrency=4, transport=httpx.MockTransport(handler), rate_limiter=unthrottled()) as fetcher:
+        for _ in fetcher.iter_fetch(urls):
+            break
+        host = fetcher.rate_limiter.for_url(urls[0])
+        deadline = time.monotonic() + 2
+        while host.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert host.in_flight == 0
@@ -0,0 +1,58 @@
+import pytest
+
+from utils import fingerprint as fp
+from utils.hash_utils import field_hash, fingerprint_book
+
+BOOK = {
+    "name": "A Light in the Attic", "description": "Poems", "category": "Poetry",
+    "price_including_tax": 51.77, "price_excluding_tax": 51.77,
+    "availability": "In stock (22 available)", "num_reviews": 0, "rating": 3,
+    "image_url": "https://books.toscrape.com/media/a.jpg",
+}
+
+
+def test_fingerprint_is_prefixed_stable_and_field_sensitive():
+    value = fp.fingerprint(BOOK)
+    assert value.startswith("b2:") and len(value) == 3 + 32
+    assert fp.fingerprint(dict(reversed(list(BOOK.items())))) == value
+    assert fp.fingerprint({**BOOK, "rating": 4}) != value
+    # types are part of the encoding: 3 and "3" differ, as do 0 and None
+    assert fp.fingerprint({**BOOK, "rating": "3"}) != value
+    assert fp.fingerprint({**BOOK, "num_reviews": None}) != value
+    # untracked fields do not matter
+    assert fp.fingerprint({**BOOK, "raw_html": "<html/>"}) == value
+
+
+def test_fingerprint_many_matches_single():
+    books = [BOOK, {**BOOK, "name": "Other"}]
+    assert fp.fingerprint_many(books) == [fp.fingerprint(b) for b in books]
+
+
+def test_fingerprint_matches_legacy_and_current_values():
+    legacy = fingerprint_book(BOOK)
+    assert fp.is_legacy(legacy)
+    assert fp.fingerprint_matches(legacy, BOOK)
+    assert not fp.fingerprint_matches(legacy, {**BOOK, "price_including_tax": 10.0})
+
+    current = fp.fingerprint(BOOK)
+    assert not fp.is_legacy(current)
+    assert fp.fingerprint_matches(current, BOOK)
+    assert not fp.fingerprint_matches(current, {**BOOK, "description": "Prose"})
+    assert not fp.fingerprint_matches(None, BOOK)
+
+
+
+def test_field_hashes_are_prefixed_and_match_legacy_values():
+    hashes = fp.field_hashes(BOOK)
+    assert set(hashes) == set(BOOK)
+    assert hashes["rating"] == fp.field_hash(3) and hashes["rating"].startswith("b2:")
+    assert fp.field_hash("3") != fp.field_hash(3)
+    assert fp.field_hash_matches(hashes["name"], BOOK["name"])
+    assert fp.field_hash_matches(field_hash(BOOK["name"]), BOOK["name"])
+    assert not fp.field_hash_matches(field_hash(BOOK["name"]), "Other")
+    assert not fp.field_hash_matches(None, BOOK["name"])
+def test_xxhash_falls_back_to_blake2b_when_not_installed(monkeypatch):
+    monkeypatch.setattr(fp, "xxhash", None)
+    assert fp.fingerprint(BOOK, algo="xxhash") == fp.fingerprint(BOOK, algo="blake2b")
+    with pytest.raises(ValueError):
+        fp.fingerprint(BOOK, algo="md5")
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """In-memory stand-in for crawler_state."""
+    store = {}
+    monkeypatch.setattr("crawler.frontier.get_state", lambda key, default=None: store.get(key, default))
+    monkeypatch.setattr("crawler.frontier.set_state", lambda key, value: store.__setitem__(key, value))
+    return store
+
+
+def test_frontier_checkpoints_pages_and_batches(state):
+    from crawler.frontier import CrawlFrontier
+
+    frontier = CrawlFrontier("test")
+    frontier.page_done(1, ["a", "b", "c"])
+    started_at = frontier.started_at
+    assert state["frontier:test"] == {
+        "next_page": 2, "pending": ["a", "b", "c"], "in_flight": [], "started_at": started_at,
+        "attempts": [], "failed": [],
+    }
+
+    batches = frontier.drain(2)
+    assert next(batches) == ["a", "b"]
+    assert state["frontier:test"]["in_flight"] == ["a", "b"]
+    assert next(batches) == ["c"]
+    assert state["frontier:test"] == {
+        "next_page": 2, "pending": [], "in_flight": ["c"], "started_at": started_at, "attempts": [], "failed": [],
+    }
+
+
+def test_frontier_resumes_in_flight_work(state):
+    from crawler.frontier import CrawlFrontier
+
+    started_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    state["frontier:test"] = {"next_page": 7, "pending": ["c"], "in_flight": ["a", "b"], "started_at": started_at}
+    frontier = CrawlFrontier("test")
+
+    assert frontier.next_page == 7
+    assert frontier.started_at == started_at
+    assert [u for batch in frontier.drain(10) for u in batch] == ["a", "b", "c"]
+    frontier.finish()
+    assert state["frontier:test"] is None
+
+
+def test_frontier_retries_failed_urls_up_to_the_cap(state, monkeypatch):
+    from crawler import frontier as frontier_mod
+
+    monkeypatch.setattr(frontier_mod, "FRONTIER_MAX_ATTEMPTS", 2)
+    frontier = frontier_mod.CrawlFrontier("test")
+    frontier.page_done(1, ["a", "b"])
+
+    seen = []
+    for batch in frontier.drain(10):
+        seen.extend(batch)
+        for url in batch:
+            if url == "a":
+                frontier.retry(url)
+    assert seen == ["a", "b", "a"]
+    assert frontier.failed == ["a"]
+
+    # attempts survive a restart
+    frontier.retry("b")
+    frontier.checkpoint()
+    assert frontier_mod.CrawlFrontier("test").attempts == {"b": 1}
+
+    frontier.finish()
+    assert state["frontier:test:failed"] == ["a"]
+    assert frontier.failed == [] and frontier.attempts == {}
@@ -0,0 +1,34 @@
+from crawler.index_advisor import find_collscans
+
+
+def test_find_collscans_in_classic_plan():
+    explain = {"queryPlanner": {"winningPlan": {
+        "stage": "SORT",
+        "inputStage": {"stage": "COLLSCAN", "filter": {"category": {"$eq": "x"}}},
+    }}}
+    assert [s["stage"] for s in find_collscans(explain)] == ["COLLSCAN"]
+
+
+def test_find_collscans_ignores_index_scans():
+    explain = {"queryPlanner": {"winningPlan": {
+        "stage": "LIMIT",
+        "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "rating_1__id_1"}},
+    }}}
+    assert find_collscans(explain) == []
+
+
+def test_find_collscans_in_or_branches_sbe_and_shards():
+    or_plan = {"stage": "SUBPLAN", "inputStage": {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN", "indexName": "rating_1__id_1"},
+        {"stage": "COLLSCAN"},
+    ]}}
+    assert len(find_collscans({"queryPlanner": {"winningPlan": or_plan}})) == 1
+
+    sbe = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}, "slotBasedPlan": {}}}}
+    assert len(find_collscans(sbe)) == 1
+
+    sharded = {"queryPlanner": {"winningPlan": {"stage": "SHARD_MERGE", "shards": [
+        {"shardName": "a", "winningPlan": {"stage": "IXSCAN"}},
+        {"shardName": "b", "winningPlan": {"stage": "COLLSCAN"}},
+    ]}}}
+    assert len(find_collscans(sharded)) == 1
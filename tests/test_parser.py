@@ -1,5 +1,5 @@
 import pytest
-from crawler.parser import parse_book_page
+from crawler.parser import extract_book_links, extract_listing_summaries, parse_book_page
 
 @pytest.fixture
 def sample_html():
@@ -33,3 +33,104 @@ def test_parse_book_page(sample_html):
     assert book.price_including_tax == 51.77
     assert book.category == "Poetry"
     assert book.rating == 3
+
+
+@pytest.fixture
+def full_page_html():
+    """Closer to a real product page: doctype, tbody, comments, nested markup and entities."""
+    return """<!DOCTYPE html>
+    <html lang="en-us" class="no-js"><head><meta charset="utf-8"><title>A Light in the Attic</title></head>
+    <body id="default" class="default">
+      <ul class="breadcrumb">
+        <li><a href="../../index.html">Home</a></li>
+        <li><a href="../category/books_1/index.html">Books</a></li>
+        <li><a href="../category/books/poetry_23/index.html">Poetry</a></li>
+        <li class="active">A Light in the Attic</li>
+      </ul>
+      <div class="row">
+        <div class="col-sm-6"><div id="product_gallery" class="carousel"><div class="thumbnail"><div class="carousel-inner">
+          <div class="item active"><img src="../../media/cache/fe/72/fe72f0532301ec28892ae79a629a293c.jpg" alt="A Light in the Attic" /></div>
+        </div></div></div></div>
+        <div class="col-sm-6 product_main">
+          <h1>A Light in the <em>Attic</em> &amp; More</h1>
+          <p class="price_color">&pound;51.77</p>
+          <p class="instock availability"><i class="icon-ok"></i> In stock (22 available) </p>
+          <p class="star-rating Three"><i class="icon-star"></i></p>
+        </div>
+      </div>
+      <div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+      <p>It's hard to imagine a world <!-- editor note --> without <b>A Light in the Attic</b>. ...more</p>
+      <table class="table table-striped">
+        <tbody>
+        <tr><th>UPC</th><td>a897fe39b1053632</td></tr>
+        <tr><th>Price (excl. tax)</th><td>&pound;51.77</td></tr>
+        <tr><th>Price (incl. tax)</th><td>&pound;51.77</td></tr>
+        <tr><th>Availability</th><td>In stock (22 available)</td></tr>
+        <tr><th>Number of reviews</th><td>0</td></tr>
+        </tbody>
+      </table>
+    </body></html>
+    """
+
+
+@pytest.mark.parametrize("fixture_name", ["sample_html", "full_page_html"])
+def test_lxml_backend_matches_bs4(request, fixture_name):
+    html = request.getfixturevalue(fixture_name)
+    url = "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html"
+
+    bs4_book = parse_book_page(html, url, backend="bs4").model_dump(exclude={"crawl_timestamp"})
+    lxml_book = parse_book_page(html, url, backend="lxml").model_dump(exclude={"crawl_timestamp"})
+
+    assert lxml_book == bs4_book
+
+
+def test_extract_book_links_backends_match():
+    html = """
+    <ol class="row">
+      <li><article class="product_pod"><h3><a href="a-light-in-the-attic_1000/index.html" title="A Light">A Light ...</a></h3></article></li>
+      <li><article class="product_pod"><h3><a href="tipping-the-velvet_999/index.html">Tipping</a></h3></article></li>
+    </ol>
+    """
+    page_url = "https://books.toscrape.com/catalogue/page-2.html"
+
+    links = extract_book_links(html, page_url, backend="lxml")
+    assert links == extract_book_links(html, page_url, backend="bs4")
+    assert links == [
+        "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html",
+        "https://books.toscrape.com/catalogue/tipping-the-velvet_999/index.html",
+    ]
+
+
+def test_extract_listing_summaries_backends_match():
+    html = """
+    <ol class="row">
+      <li><article class="product_pod">
+        <p class="star-rating Three"><i class="icon-star"></i></p>
+        <h3><a href="a-light-in-the-attic_1000/index.html" title="A Light in the Attic">A Light in the ...</a></h3>
+        <div class="product_price">
+          <p class="price_color">£51.77</p>
+          <p class="instock availability"><i class="icon-ok"></i> In stock </p>
+        </div>
+      </article></li>
+      <li><article class="product_pod">
+        <h3><a href="tipping-the-velvet_999/index.html">Tipping the Velvet</a></h3>
+      </article></li>
+    </ol>
+    """
+    page_url = "https://books.toscrape.com/catalogue/page-2.html"
+
+    summaries = extract_listing_summaries(html, page_url, backend="lxml")
+    assert summaries == extract_listing_summaries(html, page_url, backend="bs4")
+    assert summaries == [
+        {
+            "source_url": "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html",
+            "name": "A Light in the Attic",
+            "price_including_tax": 51.77,
+            "availability": "In stock",
+            "rating": 3,
+        },
+        {
+            "source_url": "https://books.toscrape.com/catalogue/tipping-the-velvet_999/index.html",
+            "name": "Tipping the Velvet",
+        },
+    ]
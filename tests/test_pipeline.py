@@ -0,0 +1,58 @@
+import httpx
+from crawler.fetcher import HttpFetcher
+from crawler.pipeline import ParsePool, fetch_and_parse
+
+
+def book_page(name):
+    return f"""
+    <html><body>
+      <div class="product_main"><h1>{name}</h1><p class="star-rating Two"></p></div>
+      <ul class="breadcrumb"><li><a href="/">Home</a></li><li><a href="/c">Poetry</a></li></ul>
+      <table class="table table-striped"><tr><th>Price (incl. tax)</th><td>£10.00</td></tr></table>
+      <div class="item active"><img src="../../media/x.jpg" /></div>
+    </body></html>
+    """
+
+
+def make_fetcher():
+    def handler(request):
+        if request.url.path == "/broken":
+            return httpx.Response(200, text="<html>not a book</html>")
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, text=book_page(request.url.path.strip("/")))
+    return HttpFetcher(transport=httpx.MockTransport(handler))
+
+
+def test_fetch_and_parse_reports_each_url():
+    urls = [f"https://example.com/book{i}" for i in range(6)] + ["https://example.com/broken", "https://example.com/missing"]
+    pool = ParsePool(workers=0)
+    with make_fetcher() as fetcher:
+        results = {i: (page, doc, err) for i, page, doc, err in fetch_and_parse(fetcher, urls, parse_pool=pool, queue_size=2)}
+
+    assert sorted(results) == list(range(len(urls)))
+    assert [results[i][1]["name"] for i in range(6)] == [f"book{i}" for i in range(6)]
+    assert "raw_html" not in results[0][1]
+    assert results[6][1] is None and results[6][2] is not None
+    assert results[7][0].status_code == 404 and results[7][1] is None and results[7][2] is None
+
+
+def test_should_parse_skips_pages():
+    urls = ["https://example.com/a", "https://example.com/b"]
+    pool = ParsePool(workers=0)
+    with make_fetcher() as fetcher:
+        results = list(fetch_and_parse(fetcher, urls, should_parse=lambda i, page: i == 1, parse_pool=pool))
+
+    docs = {i: doc for i, _, doc, _ in results}
+    assert docs[0] is None
+    assert docs[1]["name"] == "b"
+
+
+def test_process_pool_parses_in_workers():
+    pool = ParsePool(workers=2)
+    try:
+        doc = pool.submit(book_page("Remote"), "https://example.com/remote").result(timeout=60)
+    finally:
+        pool.close()
+    assert doc["name"] == "Remote"
+    assert doc["rating"] == 2
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from crawler.rate_limit import WINDOW_SIZE, HostLimiter, RateLimiter, parse_retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_retry_after():
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now=now) == 30.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    clock = Clock()
+    host = HostLimiter(rate=2, burst=2, max_concurrency=10, clock=clock)
+    delays = []
+    for _ in range(4):
+        delays.append(host.reserve())
+        host.release(0.1, status=200)
+    assert delays == [0.0, 0.0, 0.5, 1.0]
+
+    clock.now = 10.0  # idle time refills the bucket up to the burst only
+    assert host.reserve() == 0.0
+
+
+def test_concurrency_limit_blocks_reserve():
+    host = HostLimiter(max_concurrency=2, clock=Clock())
+    assert host.reserve() is not None
+    assert host.reserve() is None  # starts at half the ceiling
+    host.release(0.1, status=200)
+    assert host.reserve() is not None
+
+
+def test_aimd_grows_on_healthy_windows_and_halves_on_errors():
+    host = HostLimiter(rate=4, max_concurrency=10, max_rate=20, clock=Clock())
+    for _ in range(WINDOW_SIZE):
+        host.reserve()
+        host.release(0.1, status=200)
+    assert host.rate == 5 and host.concurrency == 6
+
+    for i in range(WINDOW_SIZE):
+        host.reserve()
+        host.release(0.1, status=500 if i < 3 else 200)
+    assert host.rate == 2.5 and host.concurrency == 3
+
+
+def test_slow_responses_back_off():
+    host = HostLimiter(rate=4, max_concurrency=4, target_latency=1, clock=Clock())
+    for _ in range(WINDOW_SIZE):
+        host.reserve()
+        host.release(3.0, status=200)
+    assert host.rate == 2 and host.concurrency == 1
+
+
+def test_retry_after_pauses_host_and_backs_off_once():
+    clock = Clock()
+    host = HostLimiter(rate=8, burst=5, max_concurrency=8, clock=clock)
+    host.reserve()
+    host.release(0.1, status=429, retry_after=30)
+    host.reserve()
+    host.release(0.1, status=429, retry_after=30)
+    assert host.rate == 4 and host.concurrency == 2
+
+    assert host.reserve() == 30.0
+
+
+def test_rate_limiter_keeps_one_limiter_per_host():
+    limiter = RateLimiter(rate=3)
+    a = limiter.for_url("https://books.toscrape.com/a.html")
+    assert limiter.for_url("https://BOOKS.toscrape.com/b.html") is a
+    assert limiter.for_url("https://example.com/") is not a
+    assert a.rate == 3
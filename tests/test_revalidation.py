@@ -0,0 +1,33 @@
+from crawler.fetcher import Page
+from crawler.revalidation import (
+    body_hash,
+    conditional_headers,
+    is_unchanged,
+    validators_from_page,
+)
+
+
+def test_validators_round_trip():
+    page = Page(
+        url="https://books.toscrape.com/x",
+        status_code=200,
+        text="<html>book</html>",
+        headers={"ETag": '"abc"', "Last-Modified": "Thu, 26 Jan 2023 10:00:00 GMT"},
+    )
+    doc = {"http_validators": validators_from_page(page)}
+
+    assert conditional_headers(doc) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Thu, 26 Jan 2023 10:00:00 GMT",
+    }
+    assert doc["http_validators"]["body_hash"] == body_hash("<html>book</html>")
+
+
+def test_is_unchanged():
+    doc = {"http_validators": {"body_hash": body_hash("<html>same</html>")}}
+
+    assert is_unchanged(doc, Page(url="u", status_code=304))
+    assert is_unchanged(doc, Page(url="u", status_code=200, text="<html>same</html>"))
+    assert not is_unchanged(doc, Page(url="u", status_code=200, text="<html>new</html>"))
+    assert not is_unchanged({}, Page(url="u", status_code=200, text="<html>same</html>"))
+    assert not is_unchanged(doc, Page(url="u", error="timeout"))
@@ -1,8 +1,22 @@
 from scheduler import worker
 
 def test_run_cycle(monkeypatch):
-    monkeypatch.setattr(worker, "discover_new_books", lambda driver: 0)
-    monkeypatch.setattr(worker, "detect_changes", lambda run_headless=True: [])
+    monkeypatch.setattr(worker, "sync_catalogue", lambda fetcher=None, writer=None, full=False: [])
+    monkeypatch.setattr(worker, "full_pass_due", lambda: False)
     monkeypatch.setattr(worker, "write_reports", lambda changes: "reports/test.json")
+    monkeypatch.setattr(worker, "bump_generation", lambda: 1)
+    monkeypatch.setattr(worker, "refresh_stats", lambda: {})
 
     worker.run_cycle()  # Should not raise
+
+
+def test_run_cycle_runs_full_pass_when_due(monkeypatch):
+    modes = []
+    monkeypatch.setattr(worker, "sync_catalogue", lambda fetcher=None, writer=None, full=False: modes.append(full) or [])
+    monkeypatch.setattr(worker, "full_pass_due", lambda: True)
+    monkeypatch.setattr(worker, "write_reports", lambda changes: "reports/test.json")
+    monkeypatch.setattr(worker, "bump_generation", lambda: 1)
+    monkeypatch.setattr(worker, "refresh_stats", lambda: {})
+
+    worker.run_cycle()
+    assert modes == [True]
@@ -1,21 +1,172 @@
+from datetime import datetime
+
 import mongomock
-from crawler.storage import upsert_book_doc
+from bson import ObjectId
+
+class RecordingCollection:
+    """Captures bulk_write calls; raises a BulkWriteError for ops listed in `fail`."""
+
+    def __init__(self, name, fail=()):
+        self.name = name
+        self.fail = set(fail)
+        self.calls = []
+
+    def bulk_write(self, ops, ordered=True):
+        from pymongo.errors import BulkWriteError
+        from unittest.mock import MagicMock
+
+        self.calls.append((ops, ordered))
+        errors = [{"index": i, "code": 11000, "errmsg": "duplicate key"} for i in range(len(ops)) if i in self.fail]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nUpserted": len(ops) - len(errors)})
+        return MagicMock(upserted_count=len(ops), modified_count=0, inserted_count=0)
+
+
+def test_bulk_writer_buffers_until_close(monkeypatch):
+    from crawler.storage import BulkWriter
+
+    books, changes = RecordingCollection("books"), RecordingCollection("changes")
+    monkeypatch.setattr("crawler.storage.books_coll", books)
+    monkeypatch.setattr("crawler.storage.changes_coll", changes)
+
+    with BulkWriter(flush_size=100, flush_interval=3600) as writer:
+        book_id = writer.upsert_book({"source_url": "https://example.com/book1", "name": "A"})
+        rec = writer.record_change(book_id, "https://example.com/book1", "new", {"created": True})
+        later = writer.record_change(book_id, "https://example.com/book1", "update", {"name": {"new": "B"}})
+        assert books.calls == [] and changes.calls == []
+        assert "_id" not in rec  # ids are assigned at flush
+
+    (ops, ordered), = books.calls
+    assert ordered is False
+    assert ops[0]._doc["$setOnInsert"] == {"_id": book_id}
+    (change_ops, change_ordered), = changes.calls
+    assert change_ordered is True
+    assert [op._doc["_id"] for op in change_ops] == [rec["_id"], later["_id"]]
+    assert rec["_id"] < later["_id"]
+
+
+def test_bulk_writer_reports_changes_an_ordered_write_skipped(monkeypatch):
+    from crawler.storage import BulkWriter
+
+    changes = RecordingCollection("changes", fail={0})
+    monkeypatch.setattr("crawler.storage.changes_coll", changes)
+
+    writer = BulkWriter(flush_size=100, flush_interval=3600)
+    for i in range(3):
+        writer.record_change(ObjectId(), f"https://example.com/book{i}", "new", {})
+    writer.flush()
+
+    assert [e["item"] for e in writer.errors] == [f"new https://example.com/book{i}" for i in range(3)]
+    assert [e["error"] for e in writer.errors] == ["duplicate key", "not written", "not written"]
+
+
+def test_bulk_writer_flushes_by_size_and_reports_errors(monkeypatch):
+    from crawler.storage import BulkWriter
+
+    books = RecordingCollection("books", fail={1})
+    monkeypatch.setattr("crawler.storage.books_coll", books)
+
+    writer = BulkWriter(flush_size=3, flush_interval=3600)
+    for i in range(3):
+        writer.upsert_book({"source_url": f"https://example.com/book{i}"})
+
+    assert len(books.calls) == 1
+    assert writer.pending == 0
+    assert writer.errors == [{"collection": "books", "item": "https://example.com/book1", "error": "duplicate key"}]
+
+
+def test_upsert_moves_raw_html_to_blob_store(monkeypatch):
+    from crawler.blob_store import get_html
+    from crawler.storage import BulkWriter
+
+    db = mongomock.MongoClient()["test_db"]
+    monkeypatch.setattr("crawler.storage.books_coll", db["books"])
+
+    with BulkWriter(flush_size=100, flush_interval=3600) as writer:
+        writer.upsert_book({"source_url": "https://example.com/book1", "raw_html": "<html>book</html>"})
+
+    result = db["books"].find_one({"source_url": "https://example.com/book1"})
+
+    assert "raw_html" not in result
+    assert get_html(result["raw_html_ref"]) == "<html>book</html>"
+
+
+
+def test_migrate_raw_html_strips_books_and_change_snapshots(monkeypatch):
+    from crawler.blob_store import get_html
+    from crawler.storage import migrate_raw_html
+
+    db = mongomock.MongoClient()["test_db"]
+    db["books"].insert_one({"source_url": "https://example.com/a", "raw_html": "<html>a</html>"})
+    db["changes"].insert_many([
+        {"change_type": "update", "old_snapshot": {"name": "A", "raw_html": "<html>old</html>"},
+         "new_snapshot": {"name": "B", "raw_html": "<html>new</html>"}},
+        {"change_type": "update", "changed_fields": {"name": {"old": "A", "new": "B"}}},
+    ])
+    monkeypatch.setattr("crawler.storage.books_coll", db["books"])
+    monkeypatch.setattr("crawler.storage.changes_coll", db["changes"])
+
+    assert migrate_raw_html() == 1
+
+    book = db["books"].find_one()
+    assert "raw_html" not in book and get_html(book["raw_html_ref"]) == "<html>a</html>"
+    legacy, current = db["changes"].find().sort("_id", 1)
+    assert legacy["old_snapshot"] == {"name": "A"} and legacy["new_snapshot"] == {"name": "B"}
+    assert "old_snapshot" not in current
+def test_bump_generation_increments_counter(monkeypatch):
+    from crawler.storage import GENERATION_KEY, bump_generation, get_state
+
+    db = mongomock.MongoClient()["test_db"]
+    monkeypatch.setattr("crawler.storage.state_coll", db["crawler_state"])
+
+    assert bump_generation() == 1
+    assert bump_generation() == 2
+    assert get_state(GENERATION_KEY) == 2
+
+
+def test_refresh_stats_materializes_facets(monkeypatch):
+    from crawler.storage import STATS_ID, refresh_stats
+
+    db = mongomock.MongoClient()["test_db"]
+    db["books"].insert_many([
+        {"category": "Poetry", "rating": 5, "price_including_tax": 12.0},
+        {"category": "Poetry", "rating": 3, "price_including_tax": 18.0},
+        {"category": "Travel", "rating": 3, "price_including_tax": 75.0},
+        # marked removed: left out of every aggregate
+        {"category": "Travel", "rating": 1, "price_including_tax": 5.0, "meta": {"removed_at": datetime(2025, 1, 1)}},
+    ])
+    monkeypatch.setattr("crawler.storage.books_coll", db["books"])
+    monkeypatch.setattr("crawler.storage.stats_coll", db["stats"])
+
+    stats = refresh_stats(boundaries=[0, 10, 20, 50])
+
+    assert stats["total_books"] == 3
+    assert stats["categories"] == [
+        {"category": "Poetry", "count": 2, "avg_price": 15.0},
+        {"category": "Travel", "count": 1, "avg_price": 75.0},
+    ]
+    assert stats["ratings"] == [{"rating": 3, "count": 2}, {"rating": 5, "count": 1}]
+    assert stats["price_buckets"] == [
+        {"min": 0, "max": 10, "count": 0},
+        {"min": 10, "max": 20, "count": 2},
+        {"min": 20, "max": 50, "count": 0},
+        {"min": 50, "max": None, "count": 1},
+    ]
+    assert stats["price"] == {"min": 12.0, "max": 75.0, "avg": 35.0}
+    assert db["stats"].find_one({"_id": STATS_ID})["total_books"] == 3
+
+
+def test_get_unseen_books_skips_removed_and_recently_listed(monkeypatch):
+    from crawler.storage import count_active_books, get_unseen_books
 
-def test_upsert_book_doc(monkeypatch):
-    mock_client = mongomock.MongoClient()
-    db = mock_client["test_db"]
+    db = mongomock.MongoClient()["test_db"]
+    db["books"].insert_many([
+        {"source_url": "seen", "meta": {"last_seen_at": datetime(2025, 1, 2)}},
+        {"source_url": "stale", "meta": {"last_seen_at": datetime(2024, 12, 31)}},
+        {"source_url": "never"},
+        {"source_url": "removed", "meta": {"removed_at": datetime(2024, 12, 1)}},
+    ])
     monkeypatch.setattr("crawler.storage.books_coll", db["books"])
 
-    book_data = {
-        "title": "Test Book",
-        "price_incl_tax": 10.5,
-        "category": "Fiction",
-        "source_url": "https://example.com/book1",
-        "rating": 4,
-        "availability": "In stock",
-        "raw_html": "<html></html>",
-    }
-
-    result = upsert_book_doc(book_data)
-    assert result["title"] == "Test Book"
-    assert db["books"].count_documents({}) == 1
+    assert set(get_unseen_books(datetime(2025, 1, 1))) == {"stale", "never"}
+    assert count_active_books() == 3
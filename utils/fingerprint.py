@@ -0,0 +1,135 @@
+# utils/fingerprint.py
+import hashlib
+import os
+import struct
+from typing import Any, Dict, Iterable, List
+
+from utils.hash_utils import TRACKED_FIELDS, field_hash as legacy_field_hash, fingerprint_book as legacy_fingerprint
+from utils.logger import get_logger
+
+logger = get_logger()
+
+try:
+    import xxhash
+except ImportError:  # optional: pip install xxhash
+    xxhash = None
+
+# "blake2b" (stdlib) or "xxhash" (faster, needs the xxhash package)
+FINGERPRINT_ALGO = os.getenv("FINGERPRINT_ALGO", "blake2b")
+
+# fields covered by a fingerprint, in encoding order; changing this list needs a new prefix
+FINGERPRINT_FIELDS = tuple(TRACKED_FIELDS)
+
+# Fingerprints are "<prefix>:<hex>". The prefix names the encoding and hash, so
+# values made under another setting can still be recomputed and compared.
+# Legacy values (sha256 of sorted JSON, utils.hash_utils.fingerprint_book / field_hash) have no prefix.
+# Per-field hashes use the same prefixes, encoding and hash.
+_PREFIXES = {"blake2b": "b2", "xxhash": "xx"}
+
+_NONE, _STR, _FLOAT, _INT, _TRUE, _FALSE = b"\x00", b"\x01", b"\x02", b"\x03", b"\x04", b"\x05"
+_pack_len = struct.Struct("<I").pack
+_pack_float = struct.Struct("<d").pack
+_pack_int = struct.Struct("<q").pack
+
+
+def _encode_value(v: Any) -> bytes:
+    """One tagged value; strings are length-prefixed so adjacent values cannot run together."""
+    if v is None:
+        return _NONE
+    if v is True or v is False:
+        return _TRUE if v else _FALSE
+    if isinstance(v, int) and -(2 ** 63) <= v < 2 ** 63:
+        return _INT + _pack_int(v)
+    if isinstance(v, float):
+        return _FLOAT + _pack_float(v)
+    b = str(v).encode("utf-8")
+    return _STR + _pack_len(len(b)) + b
+
+
+def _encode(doc: Dict[str, Any]) -> bytes:
+    """Fixed-layout encoding: one encoded value per field, in FINGERPRINT_FIELDS order."""
+    return b"".join(_encode_value(doc.get(f)) for f in FINGERPRINT_FIELDS)
+
+
+def _blake2b(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _xxhash(data: bytes) -> str:
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+def _hasher(algo: str):
+    if algo == "xxhash":
+        if xxhash is not None:
+            return _xxhash
+        logger.warning("FINGERPRINT_ALGO=xxhash but xxhash is not installed; using blake2b")
+        algo = "blake2b"
+    if algo != "blake2b":
+        raise ValueError(f"Unknown fingerprint algorithm: {algo!r}")
+    return _blake2b
+
+
+def _resolve(algo: str = None):
+    algo = algo or FINGERPRINT_ALGO
+    hasher = _hasher(algo)
+    prefix = _PREFIXES["xxhash" if hasher is _xxhash else "blake2b"]
+    return prefix, hasher
+
+
+def fingerprint(doc: Dict[str, Any], algo: str = None) -> str:
+    """Fingerprint of the tracked fields of one book."""
+    prefix, hasher = _resolve(algo)
+    return f"{prefix}:{hasher(_encode(doc))}"
+
+
+def fingerprint_many(docs: Iterable[Dict[str, Any]], algo: str = None) -> List[str]:
+    """Fingerprints for a batch of books; the hash is resolved once for the whole batch."""
+    prefix, hasher = _resolve(algo)
+    return [f"{prefix}:{hasher(_encode(d))}" for d in docs]
+
+
+def is_legacy(value: str) -> bool:
+    return bool(value) and ":" not in value
+
+
+def _digest_matches(stored: str, data: bytes) -> bool:
+    prefix, _, digest = stored.partition(":")
+    if prefix == _PREFIXES["xxhash"]:
+        return xxhash is not None and _xxhash(data) == digest
+    if prefix == _PREFIXES["blake2b"]:
+        return _blake2b(data) == digest
+    return False
+
+
+def fingerprint_matches(stored: str, doc: Dict[str, Any]) -> bool:
+    """
+    Whether `doc` has the fingerprint `stored`, whatever scheme produced it.
+    Legacy (unprefixed) values only cover the fields the old fingerprint hashed.
+    """
+    if not stored:
+        return False
+    if is_legacy(stored):
+        return legacy_fingerprint(doc) == stored
+    return _digest_matches(stored, _encode(doc))
+
+
+def field_hash(value: Any, algo: str = None) -> str:
+    """Hash of one field value, prefixed like a fingerprint."""
+    prefix, hasher = _resolve(algo)
+    return f"{prefix}:{hasher(_encode_value(value))}"
+
+
+def field_hashes(doc: Dict[str, Any], fields: list = None, algo: str = None) -> Dict[str, str]:
+    """Per-field hashes of `fields` (default TRACKED_FIELDS); fields missing from `doc` are skipped."""
+    prefix, hasher = _resolve(algo)
+    return {f: f"{prefix}:{hasher(_encode_value(doc.get(f)))}" for f in (fields or TRACKED_FIELDS) if f in doc}
+
+
+def field_hash_matches(stored: str, value: Any) -> bool:
+    """Whether `value` has the field hash `stored`, whatever scheme produced it (legacy included)."""
+    if not stored:
+        return False
+    if is_legacy(stored):
+        return legacy_field_hash(value) == stored
+    return _digest_matches(stored, _encode_value(value))
@@ -18,8 +18,9 @@ def sha256_of_dict(d: Dict[str, Any]) -> str:
 
 def fingerprint_book(doc: Dict[str, Any]) -> str:
     """
-    Compute fingerprint based on the most relevant fields.
+    Legacy content_hash: SHA-256 of the most relevant fields as sorted JSON.
     Fallback: use raw_html if main fields absent.
+    New fingerprints come from utils.fingerprint, which still compares these.
     """
     keys = ["name", "price_including_tax", "price_excluding_tax", "availability", "num_reviews", "rating"]
     canonical = canonicalize_for_hash(doc, keys)
@@ -28,3 +29,18 @@ def fingerprint_book(doc: Dict[str, Any]) -> str:
         raw = doc.get("raw_html") or ""
         return hashlib.sha256(raw.encode("utf-8")).hexdigest()
     return sha256_of_dict(canonical)
+
+# fields whose changes are detected and recorded, and the book field holding their hashes
+TRACKED_FIELDS = [
+    "name", "description", "category", "price_including_tax", "price_excluding_tax",
+    "availability", "num_reviews", "rating", "image_url",
+]
+FIELD_HASHES = "field_hashes"
+
+def field_hash(value: Any) -> str:
+    """
+    Legacy per-field hash: first 16 hex digits of the SHA-256 of the value as JSON.
+    New hashes come from utils.fingerprint.field_hash, which still compares these.
+    """
+    s = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()[:16]